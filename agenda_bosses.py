@@ -0,0 +1,194 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import desempenho
+
+# Tempo máximo de uma espera. Mesmo sem eventos próximos, a agenda volta a
+# confirmar o relógio de hora a hora (ajustes de hora do sistema, suspensões).
+ESPERA_MAXIMA = timedelta(hours=1)
+
+# Enquanto o get_proximo_spawn ainda devolver o spawn que acabou de passar
+# (trabalha ao minuto), o spawn seguinte volta a ser pedido com este intervalo.
+REPETIR_RECALCULO = timedelta(seconds=10)
+
+ALERTA = "alerta"
+RECALCULAR = "recalcular"
+
+
+class AgendaBosses:
+    """
+    Linha temporal dos próximos spawns de bosses, guardada num heap por instante.
+
+    Para cada boss é guardado o alerta do próximo spawn (spawn - alerta_antecedencia)
+    e, no instante do spawn, um evento para calcular o spawn seguinte. Assim o
+    loop só acorda quando há alguma coisa para fazer.
+    Todos os instantes são datetimes com fuso horário, por isso as mudanças de
+    hora de Europe/Lisbon não afetam as esperas.
+    """
+
+    def __init__(self, bosses, proximo_spawn):
+        self.bosses = bosses
+        self.proximo_spawn = proximo_spawn
+        self._heap = []
+        self._sequencia = itertools.count()
+        self._alterada = None
+
+    def _agendar(self, instante, tipo, boss, spawn):
+        heapq.heappush(self._heap, (instante, next(self._sequencia), tipo, boss, spawn))
+
+    def _agendar_boss(self, boss, agora, anterior=None):
+        """
+        Calcula o próximo spawn de um boss e agenda o alerta e o recálculo.
+        `anterior` é o spawn que originou o recálculo, que já não conta.
+        """
+        data = self.bosses.get(boss)
+        if data is None:
+            return
+        spawn = self.proximo_spawn(data)
+        if spawn is None:
+            # Sem spawn futuro conhecido: volta a tentar mais tarde.
+            self._agendar(agora + ESPERA_MAXIMA, RECALCULAR, boss, None)
+            return
+        if spawn <= agora or (anterior is not None and spawn <= anterior):
+            # Ainda é o spawn que acabou de passar: pede o seguinte daqui a pouco.
+            self._agendar(agora + REPETIR_RECALCULO, RECALCULAR, boss, anterior or spawn)
+            return
+        antecedencia = timedelta(minutes=data.get("alerta_antecedencia", 5))
+        # Se o arranque acontecer dentro da janela de alerta, o alerta sai de imediato.
+        self._agendar(max(spawn - antecedencia, agora), ALERTA, boss, spawn)
+        # O spawn seguinte é pedido logo que este passe, para que um spawn a
+        # menos de alerta_antecedencia do anterior ainda tenha o alerta a tempo.
+        self._agendar(spawn, RECALCULAR, boss, spawn)
+
+    def reconstruir(self, agora=None):
+        """Recalcula a linha temporal de todos os bosses (arranque ou recarregamento)."""
+        agora = agora or datetime.now(timezone.utc)
+        self._heap = []
+        for boss in self.bosses:
+            self._agendar_boss(boss, agora)
+        self._acordar()
+
+    def atualizar(self, bosses, agora=None):
+        """
+        Recalcula só os bosses indicados (novos, alterados ou removidos da
+        tabela), depois de a tabela ser recarregada; os restantes eventos
+        ficam como estão.
+        """
+        bosses = set(bosses)
+        if not bosses:
+            return
+        agora = agora or datetime.now(timezone.utc)
+        self._heap = [evento for evento in self._heap if evento[3] not in bosses]
+        heapq.heapify(self._heap)
+        for boss in bosses:
+            self._agendar_boss(boss, agora)
+        self._acordar()
+
+    def _acordar(self):
+        if self._alterada is not None:
+            self._alterada.set()
+
+    async def aguardar(self):
+        """
+        Dorme até ao próximo evento, ou menos se a linha temporal for
+        alterada entretanto (um boss recarregado pode ter um alerta mais cedo).
+        """
+        self._alterada = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._alterada.wait(), self.espera())
+        except asyncio.TimeoutError:
+            pass
+
+    def proximo_instante(self):
+        return self._heap[0][0] if self._heap else None
+
+    def espera(self, agora=None):
+        """Segundos até ao próximo evento (limitado a ESPERA_MAXIMA)."""
+        agora = agora or datetime.now(timezone.utc)
+        proximo = self.proximo_instante()
+        if proximo is None:
+            return ESPERA_MAXIMA.total_seconds()
+        return max(0.0, min(proximo - agora, ESPERA_MAXIMA).total_seconds())
+
+    def vencidos(self, agora=None):
+        """
+        Retira do heap os eventos já vencidos e devolve os alertas a enviar
+        como lista de (boss, spawn). Os recálculos são tratados aqui.
+        """
+        agora = agora or datetime.now(timezone.utc)
+        alertas, recalcular = [], []
+        while self._heap and self._heap[0][0] <= agora:
+            _, _, tipo, boss, spawn = heapq.heappop(self._heap)
+            if tipo == ALERTA:
+                if spawn > agora:
+                    alertas.append((boss, spawn))
+            else:
+                recalcular.append((boss, spawn))
+        for boss, anterior in recalcular:
+            self._agendar_boss(boss, agora, anterior)
+        return alertas
+
+
+class AlertasEnviados:
+    """
+    Registo dos alertas já enviados, com chave (boss, timestamp do spawn).
+
+    Cada entrada expira quando o spawn passa, por isso o registo nunca tem mais
+    do que uma entrada por boss (e no máximo LIMITE entradas). Se for indicado
+    um caminho, o registo é gravado em JSON para que um reinício perto de um
+    spawn não repita o alerta.
+    """
+
+    LIMITE = 500
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho
+        self._enviados = {}
+        if caminho and os.path.exists(caminho):
+            try:
+                with open(caminho, encoding="utf-8") as f:
+                    self._enviados = {(boss, int(ts)): True for boss, ts in json.load(f)}
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Não foi possível ler '{caminho}': {e}")
+
+    @staticmethod
+    def _chave(boss, spawn):
+        return (boss, int(spawn.timestamp()))
+
+    def ja_enviado(self, boss, spawn):
+        return self._chave(boss, spawn) in self._enviados
+
+    def marcar(self, boss, spawn):
+        self.limpar()
+        self._enviados[self._chave(boss, spawn)] = True
+        while len(self._enviados) > self.LIMITE:
+            # Descarta a entrada com o spawn mais antigo.
+            del self._enviados[min(self._enviados, key=lambda k: k[1])]
+        self._gravar()
+
+    def limpar(self, agora=None):
+        """Remove as entradas cujo spawn já passou."""
+        agora = (agora or datetime.now(timezone.utc)).timestamp()
+        expirados = [k for k in self._enviados if k[1] < agora]
+        for k in expirados:
+            del self._enviados[k]
+        return len(expirados)
+
+    def __len__(self):
+        return len(self._enviados)
+
+    def _gravar(self):
+        if not self.caminho:
+            return
+        temporario = f"{self.caminho}.tmp"
+        try:
+            with desempenho.span("disco", "alertas enviados"):
+                with open(temporario, "w", encoding="utf-8") as f:
+                    json.dump([list(k) for k in self._enviados], f)
+                os.replace(temporario, self.caminho)
+        except OSError as e:
+            print(f"⚠️ Não foi possível gravar '{self.caminho}': {e}")
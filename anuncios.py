@@ -0,0 +1,92 @@
+"""
+Embeds dos anúncios de bosses e das Dungeons Overflow (OFD), pré-construídos.
+
+As partes fixas de cada embed (título, cor, imagens e o texto do mapa, tipo e
+recompensa) são calculadas uma vez por boss/dungeon; em cada alerta só é
+preenchido o instante do spawn. Os modelos são descartados quando as tabelas
+BOSSES/OFD_DUNGEONS são recarregadas (ver recarregar).
+"""
+import discord
+
+_VERMELHO = discord.Color.red()
+_AZUL = discord.Color.blue()
+
+
+class ModelosAnuncios:
+    """Cache dos embeds de bosses e dungeons, construída a partir das tabelas."""
+
+    def __init__(self, bosses, dungeons):
+        self.bosses = bosses
+        self.dungeons = dungeons
+        self._modelos_bosses = {}
+        self._embeds_ofd = {}
+
+    def recarregar(self, bosses=None, dungeons=None):
+        """Troca as tabelas e descarta os modelos construídos a partir das antigas."""
+        if bosses is not None:
+            self.bosses = bosses
+        if dungeons is not None:
+            self.dungeons = dungeons
+        self.invalidar()
+
+    def invalidar(self):
+        self._modelos_bosses = {}
+        self._embeds_ofd = {}
+
+    def preparar(self):
+        """Constrói já todos os modelos (no arranque ou depois de recarregar as tabelas)."""
+        modelos = {boss: self._modelo_boss(boss, data) for boss, data in self.bosses.items()}
+        embeds = {dia: self._embeds_dia(lista) for dia, lista in self.dungeons.items()}
+        self._modelos_bosses, self._embeds_ofd = modelos, embeds
+
+    # --- Bosses ---
+
+    @staticmethod
+    def _modelo_boss(boss, data):
+        """Partes fixas do alerta: título, texto antes e depois do spawn e imagens."""
+        antes = (
+            f"📍 **Mapa:** {data['mapa']}\n"
+            f"📜 **Tipo:** {data['tipo']}\n"
+            f"💰 **Recompensa:** {data['recompensa']}\n\n"
+            f"⏰ **Respawn (Seu Horário Local):**\n"
+        )
+        depois = f"⏳ Restam **{data.get('alerta_antecedencia', 5)} minutos**! Corram para o mapa!"
+        return f"⚠️ {boss} em breve!", antes, depois, data["imagem"], data.get("mapa_imagem")
+
+    def alerta_boss(self, boss, spawn):
+        """Embed do alerta de um boss para o spawn indicado (datetime)."""
+        modelo = self._modelos_bosses.get(boss)
+        if modelo is None:
+            modelo = self._modelos_bosses[boss] = self._modelo_boss(boss, self.bosses[boss])
+        titulo, antes, depois, imagem, mapa_imagem = modelo
+        # Construir o Embed com os textos prontos é mais rápido do que copiar um embed modelo.
+        embed = discord.Embed(
+            title=titulo,
+            description=f"{antes}🗓️ **<t:{int(spawn.timestamp())}:t>**\n{depois}",
+            color=_VERMELHO,
+        )
+        embed.set_thumbnail(url=imagem)
+        if mapa_imagem is not None:
+            embed.set_image(url=mapa_imagem)
+        return embed
+
+    # --- Dungeons Overflow ---
+
+    @staticmethod
+    def _embeds_dia(dungeons):
+        embeds = []
+        for nome, nivel, icone_url in dungeons:
+            embed = discord.Embed(title=nome, description=f"Nível: {nivel}", color=_AZUL)
+            embed.set_thumbnail(url=icone_url)
+            embeds.append(embed)
+        return embeds
+
+    def dungeons_do_dia(self, dia_semana):
+        """
+        Embeds das dungeons de um dia da semana (0 = segunda). Não têm partes
+        variáveis: são sempre os mesmos objetos, que não devem ser alterados.
+        """
+        embeds = self._embeds_ofd.get(dia_semana)
+        if embeds is None:
+            embeds = self._embeds_ofd[dia_semana] = self._embeds_dia(self.dungeons.get(dia_semana, []))
+        return embeds
@@ -0,0 +1,82 @@
+"""
+Tempos de arranque do bot.
+
+Os imports pesados e as inicializações (dados, Sheets, Gemini) são feitos na
+primeira utilização ou no aquecimento em segundo plano depois do on_ready;
+cada fase é medida aqui e o relatório é mostrado na consola no fim do
+aquecimento. Para o detalhe de cada módulo: python -X importtime bot.py
+"""
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+
+_INICIO = time.perf_counter()
+_fases = []
+_lock = threading.Lock()
+
+
+@contextmanager
+def medir(fase):
+    """Regista a duração de um bloco (import ou inicialização)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _fases.append((fase, time.perf_counter() - inicio))
+
+
+def marcar(fase):
+    """Regista o tempo decorrido desde o arranque do processo (ex.: on_ready)."""
+    with _lock:
+        _fases.append((fase, time.perf_counter() - _INICIO))
+
+
+def importar(nome_modulo):
+    with medir(f"import {nome_modulo}"):
+        return importlib.import_module(nome_modulo)
+
+
+class Preguicoso:
+    """
+    Substituto de um objeto que só é criado no primeiro acesso a um atributo
+    (ex.: a base de dados, que importa o pandas). A criação é medida e é
+    thread-safe.
+    """
+
+    def __init__(self, fabrica, nome):
+        self._fabrica = fabrica
+        self._nome = nome
+        self._objeto = None
+        self._lock_criacao = threading.Lock()
+
+    @property
+    def criado(self):
+        return self._objeto is not None
+
+    def _criar(self):
+        if self._objeto is None:
+            with self._lock_criacao:
+                if self._objeto is None:
+                    with medir(self._nome):
+                        self._objeto = self._fabrica()
+        return self._objeto
+
+    def __getattr__(self, atributo):
+        return getattr(self._criar(), atributo)
+
+
+def criar(preguicoso):
+    """Cria já o objeto de um Preguicoso (usado no aquecimento)."""
+    return preguicoso._criar()
+
+
+def relatorio():
+    """Texto com as fases do arranque, da mais lenta para a mais rápida."""
+    with _lock:
+        fases = sorted(_fases, key=lambda f: f[1], reverse=True)
+    linhas = ["⏱️ Tempos de arranque:"]
+    linhas += [f"   {fase:<40} {segundos * 1000:>8.0f} ms" for fase, segundos in fases]
+    linhas.append(f"   {'total desde o início do processo':<40} {(time.perf_counter() - _INICIO) * 1000:>8.0f} ms")
+    return "\n".join(linhas)
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import time
+import unicodedata
+from collections import OrderedDict
+
+import aiohttp
+
+import desempenho
+
+MODELO = "gemini-pro"
+# Pedidos ao Gemini em simultâneo (para todo o bot).
+MAX_PEDIDOS = 2
+# Perguntas de um mesmo utilizador à espera de resposta; são respondidas por ordem.
+MAX_FILA_UTILIZADOR = 3
+# Respostas guardadas por pergunta normalizada.
+TAMANHO_CACHE = 256
+VALIDADE_CACHE = 6 * 3600
+TEMPO_LIMITE = 120
+
+
+class FilaCheia(Exception):
+    pass
+
+
+def normalizar(prompt):
+    """Chave da cache: sem diferenças de maiúsculas, espaços ou pontuação final."""
+    texto = unicodedata.normalize("NFKC", prompt).casefold()
+    return " ".join(texto.split()).rstrip("?!.… ")
+
+
+class CacheTTL:
+    """Cache LRU em que cada entrada expira ao fim de `validade` segundos."""
+
+    def __init__(self, tamanho=TAMANHO_CACHE, validade=VALIDADE_CACHE):
+        self.tamanho = tamanho
+        self.validade = validade
+        self._entradas = OrderedDict()
+
+    def obter(self, chave):
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        expira, valor = entrada
+        if expira < time.monotonic():
+            del self._entradas[chave]
+            return None
+        self._entradas.move_to_end(chave)
+        return valor
+
+    def guardar(self, chave, valor):
+        self._entradas[chave] = (time.monotonic() + self.validade, valor)
+        self._entradas.move_to_end(chave)
+        while len(self._entradas) > self.tamanho:
+            self._entradas.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+class ModeloSDK:
+    """Modelo do Gemini através do SDK google.generativeai, criado uma única vez."""
+
+    def __init__(self, nome=MODELO, chave=None):
+        self.nome = nome
+        self.chave = chave
+        self._modelo = None
+
+    def _obter(self):
+        # O SDK (grpc, protobuf) é pesado: só é importado na primeira utilização.
+        if self._modelo is None:
+            import google.generativeai as gemini
+            gemini.configure(api_key=self.chave)
+            self._modelo = gemini.GenerativeModel(self.nome)
+        return self._modelo
+
+    def preparar(self):
+        """Importa o SDK e cria o modelo (chamada bloqueante, para o aquecimento)."""
+        self._obter()
+
+    async def gerar_stream(self, partes):
+        """Devolve o texto aos bocados, à medida que o modelo o gera."""
+        with desempenho.span("http", "gemini"):
+            resposta = await self._obter().generate_content_async(partes, stream=True)
+            async for pedaco in resposta:
+                yield pedaco.text
+
+    async def fechar(self):
+        pass
+
+
+class ModeloREST:
+    """
+    Modelo servido por um endpoint compatível com a API REST do Gemini
+    (POST /v1beta/models/<modelo>:streamGenerateContent).
+    Usado com GEMINI_API_ENDPOINT,
+    por exemplo para testar contra o stub_gemini.py.
+    """
+
+    def __init__(self, endpoint, chave=None, nome=MODELO):
+        self.url = f"{endpoint.rstrip('/')}/v1beta/models/{nome}"
+        self.chave = chave
+        self._sessao = None
+
+    def _obter_sessao(self):
+        if self._sessao is None or self._sessao.closed:
+            cabecalhos = {"x-goog-api-key": self.chave} if self.chave else {}
+            self._sessao = aiohttp.ClientSession(
+                headers=cabecalhos, timeout=aiohttp.ClientTimeout(total=TEMPO_LIMITE))
+        return self._sessao
+
+    def preparar(self):
+        pass
+
+    @staticmethod
+    def _corpo(partes):
+        return {"contents": [{"role": "user", "parts": [{"text": p} for p in partes]}]}
+
+    @staticmethod
+    def _texto(dados):
+        return "".join(
+            p.get("text", "")
+            for c in dados.get("candidates", [])[:1]
+            for p in c.get("content", {}).get("parts", [])
+        )
+
+    async def gerar_stream(self, partes):
+        """streamGenerateContent em Server-Sent Events: uma resposta parcial por linha 'data:'."""
+        url = f"{self.url}:streamGenerateContent?alt=sse"
+        with desempenho.span("http", "gemini"):
+            async with self._obter_sessao().post(url, json=self._corpo(partes)) as resposta:
+                resposta.raise_for_status()
+                async for linha in resposta.content:
+                    linha = linha.strip()
+                    if linha.startswith(b"data:"):
+                        yield self._texto(json.loads(linha[5:]))
+
+    async def fechar(self):
+        if self._sessao is not None and not self._sessao.closed:
+            await self._sessao.close()
+
+
+def criar_modelo(endpoint=None, chave=None, nome=MODELO):
+    return ModeloREST(endpoint, chave, nome) if endpoint else ModeloSDK(nome, chave)
+
+
+class AssistenteGemini:
+    """
+    Perguntas ao Gemini sem bloquear o event loop.
+
+    O modelo é criado uma vez e reutilizado. No máximo MAX_PEDIDOS pedidos
+    correm ao mesmo tempo; as perguntas de cada utilizador são respondidas por
+    ordem, com até MAX_FILA_UTILIZADOR em espera. As respostas ficam numa cache
+    LRU com validade, pela pergunta normalizada, por isso as perguntas
+    frequentes da guilda respondem de imediato.
+    """
+
+    def __init__(self, modelo, max_pedidos=MAX_PEDIDOS, max_fila=MAX_FILA_UTILIZADOR, cache=None):
+        self.modelo = modelo
+        self.max_fila = max_fila
+        self.cache = cache if cache is not None else CacheTTL()
+        self._max_pedidos = max_pedidos
+        self._semaforo = None
+        self._filas = {}
+
+    async def responder(self, utilizador_id, prompt):
+        """
+        Gera a resposta aos bocados, à medida que chega do modelo (uma resposta
+        em cache sai de uma só vez). Lança FilaCheia se o utilizador já tiver
+        a fila cheia.
+        """
+        chave = normalizar(prompt)
+        resposta = self.cache.obter(chave)
+        if resposta is not None:
+            yield resposta
+            return
+
+        fila = self._filas.setdefault(utilizador_id, {"lock": asyncio.Lock(), "pendentes": 0})
+        if fila["pendentes"] >= self.max_fila:
+            raise FilaCheia()
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self._max_pedidos)
+
+        fila["pendentes"] += 1
+        try:
+            async with fila["lock"]:
+                # A mesma pergunta pode ter sido respondida enquanto esta esperava.
+                resposta = self.cache.obter(chave)
+                if resposta is not None:
+                    yield resposta
+                    return
+                pedacos = []
+                async with self._semaforo:
+                    inicio = time.perf_counter()
+                    async for pedaco in self.modelo.gerar_stream([prompt]):
+                        if not pedacos:
+                            # Tempo até ao primeiro pedaço; o span "gemini" do modelo
+                            # mede a resposta toda (incluindo o tempo de quem consome).
+                            desempenho.observar("http", "gemini (1.º pedaço)", time.perf_counter() - inicio)
+                        pedacos.append(pedaco)
+                        yield pedaco
+                # Só respostas completas vão para a cache.
+                if pedacos:
+                    self.cache.guardar(chave, "".join(pedacos))
+        finally:
+            fila["pendentes"] -= 1
+            if fila["pendentes"] == 0:
+                self._filas.pop(utilizador_id, None)
+
+    async def fechar(self):
+        await self.modelo.fechar()
@@ -0,0 +1,483 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sem pyarrow o snapshot fica em pickle
+    pa = pq = None
+
+import desempenho
+from presencas import Presencas
+
+COLUNAS = ["data", "nome", "score", "contribuicao", "dano_boss"]
+CHAVE = ["nome", "data"]
+VALORES = ["score", "contribuicao", "dano_boss"]
+
+# Esquema em memória: datas como datetime64 (comparações vetorizadas nativas),
+# nomes como categoria (um código inteiro por linha) e valores como Int64 anulável.
+ESQUEMA = {"data": "datetime64[s]", "nome": "category", **dict.fromkeys(VALORES, "Int64")}
+
+FICHEIRO_DADOS = "guild_data"
+FICHEIRO_EXCEL_ANTIGO = "guild_data.xlsx"
+
+# A compactação corre quando o log passa LIMITE_LOG alterações ou quando a
+# última compactação tem mais de INTERVALO_COMPACTACAO segundos.
+LIMITE_LOG = 5000
+INTERVALO_COMPACTACAO = 3600
+
+
+def _para_json(valor):
+    """Converte valores numpy/pandas em tipos JSON (NaN -> None)."""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if hasattr(valor, "item"):
+        valor = valor.item()
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def aplicar_esquema(df):
+    """
+    Converte um DataFrame para o ESQUEMA. Aplicado em todos os pontos de entrada
+    (snapshot, Excel antigo, log, guardar, upsert); as colunas que já estão no
+    tipo certo não são convertidas outra vez.
+    """
+    df = df.reindex(columns=COLUNAS)
+    if df["data"].dtype != ESQUEMA["data"]:
+        df["data"] = pd.to_datetime(df["data"]).dt.normalize().astype(ESQUEMA["data"])
+    if not isinstance(df["nome"].dtype, pd.CategoricalDtype):
+        df["nome"] = df["nome"].astype(str).astype("category")
+    for col in VALORES:
+        if df[col].dtype != ESQUEMA[col]:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(ESQUEMA[col])
+    return df
+
+
+_EPOCA = date(1970, 1, 1).toordinal()
+
+
+def numero_dia(dia):
+    """Número do dia (dias desde 1970-01-01) de um date/datetime/Timestamp."""
+    return dia.toordinal() - _EPOCA
+
+
+def _numeros_dia(datas):
+    """Números do dia de uma coluna datetime64, como lista de int."""
+    return datas.to_numpy().astype("datetime64[D]").astype("int64").tolist()
+
+
+def _ops_upsert(df):
+    datas = df["data"].dt.strftime("%Y-%m-%d")
+    return [
+        {"op": "upsert", "nome": r["nome"], "data": d, **{c: _para_json(r[c]) for c in VALORES}}
+        for r, d in zip(df.to_dict("records"), datas)
+    ]
+
+
+def _ops_delete(df):
+    return [
+        {"op": "delete", "nome": n, "data": d}
+        for n, d in zip(df["nome"], df["data"].dt.strftime("%Y-%m-%d"))
+    ]
+
+
+def _diferencas(antigo, novo):
+    """
+    Compara dois DataFrames pela chave (nome, data).
+    Devolve (linhas novas ou alteradas, chaves removidas).
+    """
+    antigo = antigo.drop_duplicates(CHAVE, keep="last")
+    novo = novo.drop_duplicates(CHAVE, keep="last")
+    m = antigo.merge(novo, on=CHAVE, how="outer", suffixes=("_a", ""), indicator=True)
+
+    removidos = m.loc[m["_merge"] == "left_only", CHAVE]
+
+    alterado = m["_merge"] == "right_only"
+    for col in VALORES:
+        a, n = m[f"{col}_a"], m[col]
+        iguais = (a == n).fillna(False).astype(bool) | (a.isna() & n.isna())
+        alterado |= (m["_merge"] == "both") & ~iguais
+    alterados = m.loc[alterado, COLUNAS]
+    return alterados, removidos
+
+
+def _para_tabela(df):
+    """Converte o DataFrame numa tabela Arrow: 'data' em int32 (dias desde 1970) e 'nome' em dicionário."""
+    dias = df["data"].to_numpy().astype("datetime64[D]").astype("int32")
+    return pa.table({
+        "data": pa.array(dias, type=pa.int32()),
+        "nome": pa.array(df["nome"].astype("category")),
+        **{c: pa.array(df[c], type=pa.int64(), from_pandas=True) for c in VALORES},
+    })
+
+
+def ler_snapshot(caminho):
+    """
+    Lê um snapshot Parquet para um DataFrame completo (os dados vivem em memória).
+    'data' volta a datetime64, 'nome' a categoria e os valores a Int64.
+    """
+    tabela = pq.read_table(caminho)
+    df = tabela.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+    df["data"] = df["data"].to_numpy().astype("datetime64[D]").astype(ESQUEMA["data"])
+    return df
+
+
+class BaseDados:
+    """
+    Base de dados da guilda mantida em memória com armazenamento só de acréscimo.
+
+    Cada alteração é acrescentada a um log (guild_data.wal, uma linha JSON por
+    registo) e sincronizada com o disco antes de o comando responder, por isso
+    o custo de escrita é proporcional às linhas alteradas e um crash nunca
+    deixa o ficheiro principal a meio. Periodicamente o log é compactado num
+    snapshot colunar (guild_data.parquet; guild_data.pkl se o pyarrow não
+    estiver instalado). O Excel serve apenas para importar dados antigos e
+    para exportar.
+    """
+
+    def __init__(self, caminho=FICHEIRO_DADOS, excel_antigo=FICHEIRO_EXCEL_ANTIGO):
+        self.caminho_snapshot = f"{caminho}.parquet" if pq else f"{caminho}.pkl"
+        self.caminho_pickle = f"{caminho}.pkl"
+        self.caminho_log = f"{caminho}.wal"
+        self.caminho_log_antigo = f"{caminho}.wal.1"
+        self.excel_antigo = excel_antigo
+        self._df = None
+        # Índice de chave primária: (nome, número do dia) -> rótulo da linha em self._df.
+        # Os rótulos são sempre 0..n-1, por isso servem também de posições.
+        self._indice = {}
+        # Índice de dias: números do dia ordenados e, para cada dia, as posições
+        # das suas linhas (a partição do dia).
+        self._dias = []
+        self._particoes = {}
+        # Attendance diária materializada, atualizada a cada escrita.
+        self.presencas = Presencas()
+        self._log = None
+        self._alteracoes_log = 0
+        self._ultima_compactacao = time.monotonic()
+        self._lock = threading.Lock()
+        self._lock_compactacao = threading.Lock()
+        self._lock_carregamento = threading.Lock()
+
+    # --- LEITURA ---
+    def carregar(self):
+        """
+        Lê o snapshot e repete o log para memória (uma única vez, no aquecimento
+        do arranque ou na primeira utilização).
+        """
+        with self._lock_carregamento:
+            if self._df is None:
+                with desempenho.span("disco", "carregar base de dados"):
+                    self._carregar()
+
+    def _carregar(self):
+        if os.path.exists(self.caminho_snapshot):
+            base = self._ler_snapshot()
+        elif os.path.exists(self.caminho_pickle):
+            # Snapshot em pickle de uma versão anterior: convertido na compactação abaixo.
+            base = pd.read_pickle(self.caminho_pickle)
+        elif os.path.exists(self.excel_antigo):
+            print(f"ℹ️ A importar '{self.excel_antigo}' para o novo armazenamento...")
+            base = pd.read_excel(self.excel_antigo)
+        else:
+            base = pd.DataFrame(columns=COLUNAS)
+
+        reset, registos, alteracoes = False, {}, 0
+        for caminho in (self.caminho_log_antigo, self.caminho_log):
+            r, n = self._repetir_log(caminho, registos)
+            reset, alteracoes = reset or r, alteracoes + n
+
+        base = aplicar_esquema(base.iloc[0:0] if reset else base).drop_duplicates(CHAVE, keep="last")
+        if registos:
+            # As chaves tocadas pelo log substituem as do snapshot.
+            tocadas = aplicar_esquema(pd.DataFrame(list(registos), columns=CHAVE))
+            chaves = pd.MultiIndex.from_arrays([base["nome"].astype(str), base["data"]])
+            base = base[~chaves.isin(pd.MultiIndex.from_arrays([tocadas["nome"].astype(str), tocadas["data"]]))]
+            novos = [r for r in registos.values() if r is not None]
+            if novos:
+                base = pd.concat([base, aplicar_esquema(pd.DataFrame(novos, columns=COLUNAS))])
+        df = aplicar_esquema(base.reset_index(drop=True))
+        with self._lock:
+            self._definir(df)
+            self.presencas.reconstruir(df)
+            self._alteracoes_log = alteracoes
+            if self._log is None:
+                self._log = open(self.caminho_log, "a", encoding="utf-8")
+        print(f"✅ Base de dados carregada para memória ({len(df)} registos, {alteracoes} alterações no log).")
+
+        if not os.path.exists(self.caminho_snapshot):
+            self.compactar(forcar=True)
+
+    def _ler_snapshot(self):
+        if pq:
+            return ler_snapshot(self.caminho_snapshot)
+        return pd.read_pickle(self.caminho_snapshot)
+
+    @staticmethod
+    def _repetir_log(caminho, registos):
+        """
+        Aplica as operações de um ficheiro de log a um dicionário
+        (nome, data) -> registo, ou None para as chaves apagadas.
+        A repetição é idempotente. Devolve (houve reset, número de operações).
+        """
+        if not os.path.exists(caminho):
+            return False, 0
+        reset, total = False, 0
+        with open(caminho, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    op = json.loads(linha)
+                except json.JSONDecodeError:
+                    # Última linha cortada por um crash a meio da escrita.
+                    print(f"⚠️ Linha inválida ignorada em '{caminho}'.")
+                    continue
+                if op["op"] == "reset":
+                    registos.clear()
+                    reset = True
+                    total += 1
+                    continue
+                chave = (op["nome"], date.fromisoformat(op["data"]))
+                if op["op"] == "upsert":
+                    registos[chave] = {
+                        "data": chave[1], "nome": chave[0],
+                        **{c: op.get(c) for c in VALORES},
+                    }
+                elif op["op"] == "delete":
+                    registos[chave] = None
+                total += 1
+        return reset, total
+
+    def _definir(self, df):
+        """
+        Substitui o DataFrame, ordenado por dia, e reconstrói o índice de chave
+        e o índice de dias (chamar com o lock). A ordem só se mantém até ao
+        próximo upsert, que acrescenta as linhas novas no fim; a ordem por dia
+        fica garantida pelo índice de dias, não pela posição no DataFrame.
+        """
+        df = df.sort_values("data", kind="stable").reset_index(drop=True)
+        dias = _numeros_dia(df["data"])
+        self._df = df
+        self._indice = dict(zip(zip(df["nome"], dias), df.index))
+        # Com o DataFrame ordenado, cada partição é um intervalo contíguo de posições.
+        unicos, inicios = np.unique(np.asarray(dias, dtype="int64"), return_index=True)
+        fins = np.append(inicios[1:], len(df))
+        self._dias = unicos.tolist()
+        self._particoes = {d: np.arange(i, f) for d, i, f in zip(self._dias, inicios, fins)}
+
+    def _particionar(self, dias, posicoes):
+        """Acrescenta linhas novas (no fim do DataFrame) às partições dos seus dias."""
+        por_dia = {}
+        for dia, posicao in zip(dias, posicoes):
+            por_dia.setdefault(dia, []).append(posicao)
+        for dia, novas in por_dia.items():
+            particao = self._particoes.get(dia)
+            if particao is None:
+                insort(self._dias, dia)
+                self._particoes[dia] = np.array(novas)
+            else:
+                self._particoes[dia] = np.append(particao, novas)
+
+    def existe(self, nome, data):
+        """Verifica em O(1) se existe um registo para (nome, data)."""
+        if self._df is None:
+            self.carregar()
+        return (nome, numero_dia(data)) in self._indice
+
+    def intervalo(self, inicio, fim=None):
+        """
+        Cópia dos registos entre os dias inicio e fim (inclusive; só inicio se
+        fim for None). Os dias são encontrados por pesquisa binária no índice de
+        dias e só as partições desses dias são lidas.
+        """
+        if self._df is None:
+            self.carregar()
+        fim = inicio if fim is None else fim
+        with self._lock:
+            a = bisect_left(self._dias, numero_dia(inicio))
+            b = bisect_right(self._dias, numero_dia(fim))
+            if a >= b:
+                return self._df.iloc[0:0].copy()
+            # As partições são juntadas pela ordem dos dias, por isso a cópia sai
+            # ordenada por dia mesmo com linhas acrescentadas no fim pelo upsert.
+            posicoes = np.concatenate([self._particoes[d] for d in self._dias[a:b]])
+            return self._df.take(posicoes)
+
+    def obter(self, colunas=None):
+        """
+        Devolve uma cópia do DataFrame em memória (nunca toca no disco).
+        Com colunas, copia apenas essas colunas (ex.: obter(["nome"]) no !members).
+        """
+        if self._df is None:
+            self.carregar()
+        with self._lock:
+            if colunas is not None:
+                return self._df[list(colunas)].copy()
+            return self._df.copy()
+
+    # --- ESCRITA ---
+    def guardar(self, df):
+        """
+        Substitui os dados em memória e acrescenta ao log apenas as linhas
+        novas, alteradas ou removidas.
+        """
+        if self._df is None:
+            self.carregar()
+        df = aplicar_esquema(df.reset_index(drop=True))
+        with self._lock:
+            if df.empty and not self._df.empty:
+                ops = [{"op": "reset"}]
+                self.presencas.reconstruir(df)
+            else:
+                alterados, removidos = _diferencas(self._df, df)
+                ops = _ops_delete(removidos) + _ops_upsert(alterados)
+                self.presencas.remover(removidos)
+                self.presencas.atualizar(alterados)
+            self._escrever_log(ops)
+            self._definir(df)
+
+    def upsert(self, registos, colunas=VALORES, apenas_existentes=False):
+        """
+        Insere ou atualiza um lote de registos (dicts com 'nome', 'data' e as
+        colunas indicadas) com uma única atribuição vetorizada para as linhas
+        existentes e um único concat para as novas.
+        Com apenas_existentes=True, as chaves que não existem são ignoradas.
+        Devolve a lista de chaves (nome, data) não encontradas.
+        """
+        if self._df is None:
+            self.carregar()
+        colunas = list(colunas)
+        lote = pd.DataFrame(registos, columns=CHAVE + colunas).drop_duplicates(CHAVE, keep="last")
+        if lote.empty:
+            return []
+
+        with self._lock:
+            rotulos = [self._indice.get((n, numero_dia(d))) for n, d in zip(lote["nome"], lote["data"])]
+            encontrado = pd.Series([r is not None for r in rotulos], index=lote.index)
+
+            existentes = lote[encontrado]
+            rotulos_existentes = [r for r in rotulos if r is not None]
+            if rotulos_existentes:
+                self._df.loc[rotulos_existentes, colunas] = existentes[colunas].to_numpy(dtype=object)
+
+            nao_encontrados = list(zip(lote.loc[~encontrado, "nome"], lote.loc[~encontrado, "data"]))
+            rotulos_novos = []
+            if nao_encontrados and not apenas_existentes:
+                inicio = len(self._df)
+                novos = aplicar_esquema(lote[~encontrado])
+                novos.index = pd.RangeIndex(inicio, inicio + len(novos))
+                if len(self._df):
+                    # Alarga as categorias (ordenadas, para o sort por nome continuar
+                    # alfabético) antes do concat, para 'nome' continuar categoria.
+                    categorias = self._df["nome"].cat.categories
+                    nomes_novos = novos["nome"].cat.categories.difference(categorias)
+                    if len(nomes_novos):
+                        self._df["nome"] = self._df["nome"].cat.set_categories(categorias.union(nomes_novos))
+                    novos["nome"] = novos["nome"].astype(self._df["nome"].dtype)
+                    self._df = pd.concat([self._df, novos])
+                else:
+                    self._df = novos
+                rotulos_novos = list(novos.index)
+                dias_novos = _numeros_dia(novos["data"])
+                self._indice.update(zip(zip(novos["nome"], dias_novos), rotulos_novos))
+                self._particionar(dias_novos, rotulos_novos)
+                nao_encontrados = []
+
+            afetados = self._df.loc[rotulos_existentes + rotulos_novos, COLUNAS]
+            self._escrever_log(_ops_upsert(afetados))
+            self.presencas.atualizar(afetados)
+        return nao_encontrados
+
+    # --- ATTENDANCE ---
+    def dias_recentes(self, n=2):
+        """Os n dias mais recentes com registos (do mais recente para o mais antigo)."""
+        if self._df is None:
+            self.carregar()
+        with self._lock:
+            return self.presencas.dias_recentes(n)
+
+    def comparar_dias(self, final, inicial):
+        """ResultadoPresencas dos membros do dia final em relação ao dia inicial (O(membros))."""
+        if self._df is None:
+            self.carregar()
+        with self._lock:
+            return self.presencas.comparar(final, inicial)
+
+    def _escrever_log(self, ops):
+        """Acrescenta operações ao log e força a escrita no disco (chamar com o lock)."""
+        if not ops:
+            return
+        with desempenho.span("disco", "log de alterações"):
+            self._log.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops))
+            self._log.flush()
+            os.fsync(self._log.fileno())
+        self._alteracoes_log += len(ops)
+
+    # --- COMPACTAÇÃO ---
+    @property
+    def precisa_compactar(self):
+        if self._alteracoes_log == 0:
+            return False
+        return (self._alteracoes_log >= LIMITE_LOG
+                or time.monotonic() - self._ultima_compactacao >= INTERVALO_COMPACTACAO)
+
+    def compactar(self, forcar=False):
+        """
+        Grava um snapshot completo e descarta o log já incluído nele.
+        O log é rodado antes de escrever o snapshot, para que as escritas
+        concorrentes continuem a ir para um log novo.
+        """
+        with self._lock_compactacao:
+            with self._lock:
+                if not forcar and self._alteracoes_log == 0:
+                    return False
+                # A conversão é feita com o lock: o DataFrame é alterado no lugar pelos upserts.
+                snapshot = _para_tabela(self._df) if pq else self._df.copy()
+                self._log.close()
+                if os.path.exists(self.caminho_log_antigo):
+                    # Uma compactação anterior falhou: junta o log atual ao antigo.
+                    with open(self.caminho_log, encoding="utf-8") as atual, \
+                            open(self.caminho_log_antigo, "a", encoding="utf-8") as antigo:
+                        antigo.write(atual.read())
+                        antigo.flush()
+                        os.fsync(antigo.fileno())
+                    os.remove(self.caminho_log)
+                elif os.path.exists(self.caminho_log):
+                    os.replace(self.caminho_log, self.caminho_log_antigo)
+                self._log = open(self.caminho_log, "a", encoding="utf-8")
+                self._alteracoes_log = 0
+                self._ultima_compactacao = time.monotonic()
+
+            temporario = f"{self.caminho_snapshot}.tmp"
+            with desempenho.span("disco", "gravar snapshot"):
+                if pq:
+                    pq.write_table(snapshot, temporario)
+                else:
+                    snapshot.to_pickle(temporario)
+                with open(temporario, "rb") as f:
+                    os.fsync(f.fileno())
+                os.replace(temporario, self.caminho_snapshot)
+            if os.path.exists(self.caminho_log_antigo):
+                os.remove(self.caminho_log_antigo)
+            if self.caminho_pickle != self.caminho_snapshot and os.path.exists(self.caminho_pickle):
+                os.remove(self.caminho_pickle)
+            return True
+
+    def fechar(self):
+        """Compacta e fecha o log (chamado ao desligar o bot)."""
+        if self._log is None:
+            return
+        self.compactar()
+        with self._lock:
+            self._log.close()
+            self._log = None
+
+
+base_dados = BaseDados()
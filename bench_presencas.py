@@ -0,0 +1,81 @@
+"""
+Benchmark do motor de attendance (presencas.py).
+
+Uso: python bench_presencas.py [--membros 10000] [--dias 365]
+
+Gera um histórico sintético de membros x dias e mede a reconstrução da
+attendance materializada, a comparação dos dois últimos dias, a comparação
+de dois dias arbitrários e o recálculo depois de um lote de inserções,
+contra a versão antiga (dicionários + ciclo em Python).
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from presencas import Presencas
+
+
+def gerar_historico(membros, dias):
+    rng = np.random.default_rng(42)
+    nomes = np.array([f"membro{i}" for i in range(membros)], dtype=object)
+    datas = np.array([date(2025, 1, 1) + timedelta(days=d) for d in range(dias)], dtype=object)
+    return pd.DataFrame({
+        "data": np.repeat(datas, membros),
+        "nome": np.tile(nomes, dias),
+        "score": np.cumsum(rng.integers(0, 4, size=(dias, membros)), axis=0).ravel(),
+        "contribuicao": np.cumsum(rng.integers(0, 2000, size=(dias, membros)), axis=0).ravel(),
+    })
+
+
+def comparar_antigo(df, final, inicial):
+    """A implementação anterior: duas máscaras sobre o histórico e um ciclo por membro."""
+    dados_iniciais = df[df["data"] == inicial].set_index("nome").to_dict("index")
+    dados_finais = df[df["data"] == final].set_index("nome").to_dict("index")
+    ok = 0
+    for nome, dados_f in dados_finais.items():
+        score_i = dados_iniciais.get(nome, {}).get("score", 0)
+        contrib_i = dados_iniciais.get(nome, {}).get("contribuicao", 0)
+        if dados_f["score"] - score_i >= 2 and dados_f["contribuicao"] - contrib_i >= 1050:
+            ok += 1
+    return ok
+
+
+def medir(descricao, func, linhas):
+    inicio = time.perf_counter()
+    resultado = func()
+    duracao = time.perf_counter() - inicio
+    print(f"{descricao:<45} {duracao * 1000:>10.1f} ms  {linhas / duracao:>14,.0f} linhas/s")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--membros", type=int, default=10_000)
+    parser.add_argument("--dias", type=int, default=365)
+    args = parser.parse_args()
+
+    df = gerar_historico(args.membros, args.dias)
+    total = len(df)
+    print(f"Histórico: {args.membros:,} membros x {args.dias} dias = {total:,} linhas\n")
+
+    presencas = Presencas()
+    medir("reconstruir (arranque)", lambda: presencas.reconstruir(df), total)
+
+    hoje, ontem = presencas.dias_recentes(2)
+    r = medir("comparar últimos 2 dias (1.ª vez)", lambda: presencas.comparar(hoje, ontem), args.membros)
+    medir("comparar últimos 2 dias (materializado)", lambda: presencas.comparar(hoje, ontem), args.membros)
+    primeiro = presencas._dias[0]
+    medir("comparar 2 dias arbitrários", lambda: presencas.comparar(hoje, primeiro), args.membros)
+
+    lote = df[df["data"] == hoje].head(100).assign(score=lambda d: d["score"] + 5)
+    medir("lote de 100 inserções + comparar", lambda: (presencas.atualizar(lote), presencas.comparar(hoje, ontem)), 100)
+
+    ok_antigo = medir("versão antiga (máscaras + ciclo Python)", lambda: comparar_antigo(df, hoje, ontem), total)
+    print(f"\nCumpriram (motor): {r.cumpriram:,} | (versão antiga): {ok_antigo:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,81 @@
 import os
-import discord
-from discord.ext import commands, tasks
+import importlib.util
+from arranque import medir, marcar, importar, criar, Preguicoso, relatorio
+with medir("import discord"):
+    import discord
+    from discord.ext import commands, tasks
+import aiohttp
 from datetime import datetime, time, timedelta
 import pytz
 import asyncio
 from dotenv import load_dotenv
-import pandas as pd
 from boss import BOSSES, get_proximo_spawn, TZ_PT, alertas_bosses_enviados
-import google.generativeai as gemini
-import requests
-import base64
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
 import json
 from eventos import OFD_DUNGEONS, TZ_PT # OFD_DUNGEONS removido aqui, mas mantido para referência
 from investigacao import Investigacao
+from agenda_bosses import AgendaBosses, AlertasEnviados, ESPERA_MAXIMA
+from execucao import executar, executar_escrita
+from planilha import ConfiguracoesSheets
+from paginacao import enviar_paginas, enviar_progressivo
+import envios
+from anuncios import ModelosAnuncios
+from tabelas import Tabelas, TabelasInvalidas
+from ocr import ClienteOCR, ErroOCR, extrair_registos
+from assistente import AssistenteGemini, FilaCheia, criar_modelo
+from saude import ServidorSaude
+import desempenho
+import execucao
 # from score import get_score_report # APENAS NECESSÁRIO SE A TAREFA scheduled_score_check PERMANECER AQUI
 
+# Subsistemas pesados (pandas, gspread, Gemini) só são carregados na primeira
+# utilização ou no aquecimento depois do on_ready (ver arranque.py).
+base_dados = Preguicoso(lambda: importar("base_dados").base_dados, "criar base_dados")
+exportacao = Preguicoso(lambda: importar("exportacao"), "carregar exportacao")
+ingestao = Preguicoso(lambda: importar("ingestao"), "carregar ingestao")
+# Aceder a um atributo destes objetos cria-os (e importa o pandas): nos comandos
+# isso é feito dentro do executor, ex.: executar(lambda: base_dados.existe(...)),
+# nunca no event loop.
+
+# Formatos do !exportar_excel (os mesmos de exportacao.FORMATOS), sem importar o módulo.
+FORMATOS_EXPORTACAO = ["xlsx", "csv"] + (["parquet"] if importlib.util.find_spec("pyarrow") else [])
+
 # --- 1. CONFIGURAÇÃO DE CREDENCIAIS GSPREAD (Define 'gc') ---
-gc = None
 GSPREAD_CREDENTIALS_PATH = 'credentials.json'
 
-# 1. Tenta Variável de Ambiente
-creds_json = os.getenv('GSPREAD_CREDS_JSON')
+def autenticar_gspread():
+    """Autentica o cliente gspread (chamada bloqueante, feita no on_ready fora do event loop)."""
+    gspread = importar("gspread")
+    gc = None
 
-if creds_json:
-    try:
-        creds = json.loads(creds_json)
-        gc = gspread.service_account_from_dict(creds)
-        print("✅ Cliente Gspread autenticado via Variável de Ambiente.")
-    except Exception as e:
-        print(f"❌ Falha na autenticação Gspread (Variável de Ambiente): {e}")
-
-# 2. Se a variável falhou ou não existe, tenta o Ficheiro Local (Fallback)
-if gc is None:
-    try:
-        gc = gspread.service_account(filename=GSPREAD_CREDENTIALS_PATH)
-        print("✅ Cliente Gspread autenticado via Ficheiro local.")
-    except Exception as e:
-        print(f"❌ Falha na autenticação Gspread (Ficheiro Local): {e}")
+    # 1. Tenta Variável de Ambiente
+    creds_json = os.getenv('GSPREAD_CREDS_JSON')
 
+    if creds_json:
+        try:
+            creds = json.loads(creds_json)
+            gc = gspread.service_account_from_dict(creds)
+            print("✅ Cliente Gspread autenticado via Variável de Ambiente.")
+        except Exception as e:
+            print(f"❌ Falha na autenticação Gspread (Variável de Ambiente): {e}")
 
-# --- 2. SERVIDOR WEB PARA O HEALTH CHECK ---
-class HealthCheckHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.end_headers()
-        self.wfile.write(b'OK')
+    # 2. Se a variável falhou ou não existe, tenta o Ficheiro Local (Fallback)
+    if gc is None:
+        try:
+            gc = gspread.service_account(filename=GSPREAD_CREDENTIALS_PATH)
+            print("✅ Cliente Gspread autenticado via Ficheiro local.")
+        except Exception as e:
+            print(f"❌ Falha na autenticação Gspread (Ficheiro Local): {e}")
+    return gc
 
-def run_server():
-    server_address = ('', 8080)
-    httpd = HTTPServer(server_address, HealthCheckHandler)
-    httpd.serve_forever()
 
 # --- 3. CONFIGURAÇÕES E INICIALIZAÇÃO DO BOT (Define 'bot') ---
 load_dotenv()
 OCR_API_KEY = os.getenv("OCR_API_KEY")
-OCR_API_URL = "https://api.ocr.space/parse/image"
+# Pode apontar para um servidor local (ver stub_ocr.py) em testes.
+OCR_API_URL = os.getenv("OCR_API_URL", "https://api.ocr.space/parse/image")
 TOKEN = os.getenv("DISCORD_TOKEN")
-gemini.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Endpoint alternativo compatível com a API REST do Gemini (ex.: stub_gemini.py em testes).
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
 
 CANAL_RESET_ID = 1410247550556180530
 CANAL_BOSS_ID = 1409486809813221440
@@ -74,50 +89,67 @@ intents.reactions = True
 
 # 🚨 CRÍTICO: 'bot' é definido aqui!
 bot = commands.Bot(command_prefix="!", intents=intents)
+# Tempo de cada comando em histogramas (ver desempenho.py e !perf).
+desempenho.instrumentar_comandos(bot)
 
 
 # =======================================================================
 # 4. ANEXAR O CLIENTE GSPREAD E FUNÇÕES AUXILIARES
 # =======================================================================
-bot.gc = gc # Anexa o cliente GSpread ao objeto bot
+bot.gc = None # Cliente GSpread: anexado no on_ready, depois de autenticar
+
+# Cliente HTTP do OCR (sessão única, reutilizada entre comandos).
+cliente_ocr = ClienteOCR(OCR_API_URL, OCR_API_KEY)
+bot.cliente_ocr = cliente_ocr
+
+# Modelo do Gemini criado uma vez, com limite de pedidos, fila por utilizador e cache.
+assistente = AssistenteGemini(criar_modelo(GEMINI_API_ENDPOINT, os.getenv("GEMINI_API_KEY")))
+bot.assistente = assistente
+
+# Health check (/, /health) e métricas (/metrics) no event loop do bot (ver saude.py).
+servidor_saude = ServidorSaude(bot)
+bot.servidor_saude = servidor_saude
+
+_fechar_bot = bot.close
+
+async def fechar_bot():
+    """Fecha as sessões HTTP ainda dentro do event loop, antes de desligar o bot."""
+    desempenho.vigia.parar()
+    await servidor_saude.parar()
+    await cliente_ocr.fechar()
+    await assistente.fechar()
+    await _fechar_bot()
+
+bot.close = fechar_bot
+
+
+# ATENÇÃO: SUBSTITUA '1d1NQgR6i3EB8zrGdoqj302tOjZOmSVBcAKgcJv8lpoI' PELA CHAVE DA SUA PLANILHA REAL
+configuracoes_ids = ConfiguracoesSheets(None, '1d1NQgR6i3EB8zrGdoqj302tOjZOmSVBcAKgcJv8lpoI', 'ConfiguracoesIDs')
+bot.configuracoes_ids = configuracoes_ids
 
 
 def gerir_setup_persistente(acao, chave=None, valor=None):
     """
     Função para ler ou escrever IDs de mensagens de setup persistentes no Google Sheets.
     A folha de destino será 'ConfiguracoesIDs'.
+    As leituras vêm da cache em memória; as escritas atualizam a cache e são
+    enviadas ao Sheets em segundo plano (ver planilha.py).
     """
-    # Use 'bot' (assumindo que o bot está no escopo)
-    if not hasattr(bot, 'gc') or bot.gc is None:
+    if not configuracoes_ids.disponivel:
         print("❌ GSpread indisponível para persistência de setup.")
         return None
 
     try:
-        # ATENÇÃO: SUBSTITUA '1d1NQgR6i3EB8zrGdoqj302tOjZOmSVBcAKgcJv8lpoI' PELA CHAVE DA SUA PLANILHA REAL
-        sh = bot.gc.open_by_key('1d1NQgR6i3EB8zrGdoqj302tOjZOmSVBcAKgcJv8lpoI')
-        worksheet = sh.worksheet('ConfiguracoesIDs')
+        if acao == 'ler':
+            return configuracoes_ids.ler()
+
+        elif acao == 'escrever' and chave and valor:
+            configuracoes_ids.escrever(chave, valor)
+            return True
     except Exception as e:
         print(f"❌ Falha ao aceder à folha 'ConfiguracoesIDs' para persistência: {e}")
         return None
 
-
-    if acao == 'ler':
-        records = worksheet.get_all_records()
-        return {r['Chave']: int(r['Valor']) if str(r['Valor']).isdigit() else r['Valor'] for r in records}
-    
-    elif acao == 'escrever' and chave and valor:
-        try:
-            cell = worksheet.find(chave)
-            if cell:
-                worksheet.update_cell(cell.row, cell.col + 1, str(valor))
-                return True
-            else:
-                worksheet.append_row([chave, str(valor)])
-                return True
-        except Exception as e:
-            print(f"❌ Falha ao escrever na folha 'ConfiguracoesIDs': {e}")
-            return None
-    
     return None
 
 # CRÍTICO: Anexar a função ao objeto bot.
@@ -125,22 +157,19 @@ bot.gerir_setup_persistente = gerir_setup_persistente
 
 
 # --- FUNÇÕES DE DADOS (USANDO EXCEL/PANDAS) ---
+# Os dados vivem em memória (base_dados.py) e cada alteração é acrescentada a
+# um log em disco. O 'guild_data.xlsx' antigo só é importado no primeiro
+# arranque; o Excel passa a ser apenas formato de exportação (!exportar_excel).
 def get_data_from_excel():
     """
-    Carrega os dados do arquivo Excel para um DataFrame.
-    Se o arquivo não existir, cria um novo DataFrame vazio.
+    Devolve uma cópia dos dados da guilda em memória.
+    Se ainda não há dados, devolve um DataFrame vazio.
     """
-    try:
-        df = pd.read_excel("guild_data.xlsx")
-        if 'data' in df.columns:
-            df['data'] = pd.to_datetime(df['data']).dt.date
-    except FileNotFoundError:
-        df = pd.DataFrame(columns=["data", "nome", "score", "contribuicao", "dano_boss"])
-    return df
+    return base_dados.obter()
 
 def save_data_to_excel(df):
-    """Salva o DataFrame de volta no arquivo Excel."""
-    df.to_excel("guild_data.xlsx", index=False)
+    """Atualiza os dados em memória e regista no log apenas as linhas alteradas."""
+    base_dados.guardar(df)
 
 def data_logica():
     """Calcula a data lógica de reset (16:00, Europa/Lisboa)."""
@@ -181,6 +210,7 @@ async def apagar_mensagem(ctx_or_msg, segundos=5):
 # Se o score.py não contiver a task, então ela está aqui:
 
 @tasks.loop(time=datetime.strptime('16:05', '%H:%M').time())
+@desempenho.cronometrado("tarefa")
 async def scheduled_score_check():
     # Esta task deve ser movida para score.py, ou deve importar a lógica de lá.
     await bot.wait_until_ready()
@@ -201,57 +231,103 @@ async def scheduled_score_check():
     # Por enquanto, deixamos o check para o on_ready.
     pass # Deixamos vazio para a compatibilidade.
 
+# --- COMPACTAÇÃO DA BASE DE DADOS EM SEGUNDO PLANO ---
+@tasks.loop(minutes=5)
+@desempenho.cronometrado("tarefa")
+async def compactar_base_dados():
+    # Antes do aquecimento a base de dados ainda não foi criada: não há nada para compactar.
+    if not base_dados.criado or not base_dados.precisa_compactar:
+        return
+    try:
+        await asyncio.to_thread(base_dados.compactar)
+    except Exception as e:
+        print(f"❌ Falha ao compactar a base de dados: {e}")
+
 # --- TASKS EM LOOP (BOSSES) ---
 # ESTAS TAREFAS SÃO MELHOR MOVIDAS PARA boss.py, mas mantidas aqui se for o caso.
-alertas_bosses_enviados = {}
-@tasks.loop(minutes=1)
+# Os alertas são enviados pelos loops da cog 'boss.py'; o check_bosses só a
+# substitui quando a cog não carrega (ver setup_hook), senão cada alerta
+# sairia duas vezes.
+# Em vez de verificar todos os bosses a cada minuto, a agenda guarda os próximos
+# alertas num heap e o loop dorme até ao próximo (ver agenda_bosses.py).
+agenda_bosses = AgendaBosses(BOSSES, get_proximo_spawn)
+# Alertas já enviados por (boss, spawn); gravado em disco para sobreviver a reinícios.
+alertas_bosses_enviados = AlertasEnviados("alertas_bosses_enviados.json")
+# Embeds dos alertas e das dungeons com as partes fixas já construídas (ver anuncios.py).
+anuncios = ModelosAnuncios(BOSSES, OFD_DUNGEONS)
+try:
+    anuncios.preparar()
+except (KeyError, TypeError, ValueError) as e:
+    # Uma entrada mal definida só falha no próprio alerta, como antes.
+    print(f"⚠️ Não foi possível pré-construir os embeds dos anúncios: {e!r}")
+
+# BOSSES e OFD_DUNGEONS podem ser recarregados de tabelas.json sem reiniciar o
+# bot (ver tabelas.py, a task vigiar_tabelas e o !recarregartabelas).
+tabelas = Tabelas(BOSSES, OFD_DUNGEONS, proximo_spawn=get_proximo_spawn)
+
+@tabelas.ao_recarregar
+def aplicar_tabelas(bosses_alterados, dias_alterados):
+    # Só os bosses alterados voltam a ser calculados; o resto da linha temporal fica.
+    agenda_bosses.atualizar(bosses_alterados)
+    anuncios.recarregar()
+    anuncios.preparar()
+
+@tasks.loop(seconds=30)
+@desempenho.cronometrado("tarefa")
+async def vigiar_tabelas():
+    try:
+        resultado = await tabelas.recarregar()
+    except TabelasInvalidas as e:
+        print(f"❌ '{tabelas.caminho}' inválido, as tabelas em uso não foram alteradas: {e}")
+        return
+    except OSError as e:
+        print(f"❌ Não foi possível ler '{tabelas.caminho}': {e}")
+        return
+    if resultado is not None:
+        bosses_alterados, dias_alterados = resultado
+        print(f"✅ Tabelas recarregadas de '{tabelas.caminho}' ({len(tabelas.bosses)} bosses, "
+              f"{len(bosses_alterados)} alterados; {len(dias_alterados)} dia(s) de OFD alterados).")
+
+@tasks.loop()
 async def check_bosses():
-    tz_pt = pytz.timezone("Europe/Lisbon")
-    agora = datetime.now(tz=tz_pt).replace(second=0, microsecond=0)
+    # Acorda mais cedo se as tabelas forem recarregadas entretanto.
+    await agenda_bosses.aguardar()
+    servidor_saude.marcar("check_bosses")
+    await enviar_alertas_bosses()
+
+# Medido à parte da espera, para o tempo refletir só o envio dos alertas.
+@desempenho.cronometrado("tarefa", "check_bosses")
+async def enviar_alertas_bosses():
+    alertas = agenda_bosses.vencidos()
+    if not alertas:
+        return
+
     canal = bot.get_channel(CANAL_BOSS_ID)
     if not canal:
         return
 
-    global alertas_bosses_enviados
-    data_hoje = agora.date()
-    if alertas_bosses_enviados.get("data") != data_hoje:
-        alertas_bosses_enviados.clear()
-        alertas_bosses_enviados["data"] = data_hoje
-
-    for boss, data in BOSSES.items():
-        proximo_spawn_pt = get_proximo_spawn(data)
-
-        if proximo_spawn_pt is None:
-            continue
-            
-        antecedencia = timedelta(minutes=data.get("alerta_antecedencia", 5))
-        horario_alerta = proximo_spawn_pt - antecedencia
-            
-        key = proximo_spawn_pt.strftime(f"{boss}_%Y-%m-%d %H:%M")
-
-        if alertas_bosses_enviados.get(key):
+    pendentes, embeds = [], []
+    for boss, proximo_spawn_pt in alertas:
+        if alertas_bosses_enviados.ja_enviado(boss, proximo_spawn_pt):
             continue
+        pendentes.append((boss, proximo_spawn_pt))
+        embeds.append(anuncios.alerta_boss(boss, proximo_spawn_pt))
+
+    # Prioridade máxima no agendador; os alertas vencidos em simultâneo saem juntos
+    # (até 10 embeds por mensagem).
+    resultados = await envios.enviar_embeds(canal, embeds, prioridade=envios.ALTA)
+    for (boss, proximo_spawn_pt), resultado in zip(pendentes, resultados):
+        if isinstance(resultado, Exception):
+            print(f"❌ Falha ao enviar o alerta de {boss}: {resultado}")
+        else:
+            alertas_bosses_enviados.marcar(boss, proximo_spawn_pt)
 
-        if agora >= horario_alerta and agora < proximo_spawn_pt:
-            unix_time_pt = int(proximo_spawn_pt.timestamp())
-            embed = discord.Embed(
-                title=f"⚠️ {boss} em breve!",
-                description=(
-                    f"📍 **Mapa:** {data['mapa']}\n"
-                    f"📜 **Tipo:** {data['tipo']}\n"
-                    f"💰 **Recompensa:** {data['recompensa']}\n\n"
-                    f"⏰ **Respawn (Seu Horário Local):**\n"
-                    f"🗓️ **<t:{unix_time_pt}:t>**\n"
-                    f"⏳ Restam **{data.get('alerta_antecedencia', 5)} minutos**! Corram para o mapa!"
-                ),
-                color=discord.Color.red()
-            )
-            embed.set_thumbnail(url=data["imagem"])
-            if "mapa_imagem" in data:
-                embed.set_image(url=data["mapa_imagem"])
-            
-            await canal.send(embed=embed)
-            alertas_bosses_enviados[key] = True
+@check_bosses.before_loop
+async def antes_check_bosses():
+    await bot.wait_until_ready()
+    # Calcula a linha temporal no arranque (e a cada reinício da task).
+    agenda_bosses.reconstruir()
+    servidor_saude.marcar("check_bosses")
 
 # --- FUNÇÃO OFD MANUAL ---
 # Esta função de OFD deve ser chamada pela cog 'eventos.py' se esta for uma Cog.
@@ -275,16 +351,9 @@ async def enviar_ofd_diario():
         await asyncio.sleep((reset_time - agora_pt).total_seconds())
 
         dia_semana = reset_time.weekday()
-        dungeons_hoje = OFD_DUNGEONS.get(dia_semana, [])
 
-        for nome, nivel, icone_url in dungeons_hoje:
-            embed = discord.Embed(
-                title=nome,
-                description=f"Nível: {nivel}",
-                color=discord.Color.blue(),
-            )
-            embed.set_thumbnail(url=icone_url)
-            await canal.send(embed=embed)
+        # Uma mensagem com todas as dungeons do dia, em vez de uma por dungeon.
+        await envios.enviar_embeds(canal, anuncios.dungeons_do_dia(dia_semana))
 
 
 # ----------------------------------------------------------------------
@@ -296,24 +365,13 @@ async def enviar_ofd_diario():
 @bot.command()
 async def members(ctx):
     try:
-        df = get_data_from_excel()
-        if df.empty:
+        membros = await executar(lambda: sorted(base_dados.obter(["nome"])["nome"].unique()))
+        if not membros:
             await ctx.send("❌ Nenhum membro registrado na base de dados.")
             return
 
-        membros = df["nome"].unique()
         total = len(membros)
-        
-        texto_atual = ""
-        for membro in sorted(membros):
-            if len(texto_atual) + len(membro) + 1 > 1900:
-                await ctx.send(f"```{texto_atual}```")
-                texto_atual = membro + "\n"
-            else:
-                texto_atual += membro + "\n"
-        
-        if texto_atual:
-            await ctx.send(f"```{texto_atual.strip()}```")
+        await enviar_paginas(ctx, membros, nome_ficheiro="membros.txt")
 
         await ctx.send(f"✅ Total de membros registrados: {total}")
 
@@ -331,24 +389,13 @@ async def inserir(ctx, nome: str, score: int, contribuicao: int, dano_boss: int
                 await ctx.send("❌ Formato de data inválido. Por favor, use **AAAA/MM/DD**.")
                 return
 
-        df = get_data_from_excel()
-        
-        novo_registro = {
+        await executar_escrita(lambda: base_dados.upsert([{
             "data": dt,
             "nome": nome,
             "score": score,
             "contribuicao": contribuicao,
             "dano_boss": dano_boss
-        }
-        
-        novo_df = pd.DataFrame([novo_registro])
-
-        if ((df['nome'] == nome) & (df['data'] == dt)).any():
-            df.loc[(df['nome'] == nome) & (df['data'] == dt), ['score', 'contribuicao', 'dano_boss']] = [score, contribuicao, dano_boss]
-        else:
-            df = pd.concat([df, novo_df], ignore_index=True)
-
-        save_data_to_excel(df)
+        }]))
         
         await ctx.send(f"✅ Registro inserido/atualizado: {nome} | Score={score} | Contribuição={contribuicao} | Dano Boss={dano_boss} | Data={dt}")
         
@@ -362,10 +409,8 @@ async def inserir(ctx, nome: str, score: int, contribuicao: int, dano_boss: int
                 msg = await bot.wait_for('message', check=check, timeout=30.0)
                 novo_dano = int(msg.content)
 
-                df = get_data_from_excel()
-                if ((df['nome'] == nome) & (df['data'] == dt)).any():
-                    df.loc[(df['nome'] == nome) & (df['data'] == dt), 'dano_boss'] = novo_dano
-                    save_data_to_excel(df)
+                registo = {"nome": nome, "data": dt, "dano_boss": novo_dano}
+                if not await executar_escrita(lambda: base_dados.upsert([registo], colunas=["dano_boss"], apenas_existentes=True)):
                     await ctx.send(f"✅ Dano do boss atualizado para **{novo_dano}**.")
             except asyncio.TimeoutError:
                 await ctx.send("⏳ Tempo esgotado. A atualização do dano do boss foi cancelada.")
@@ -376,86 +421,95 @@ async def inserir(ctx, nome: str, score: int, contribuicao: int, dano_boss: int
         await ctx.send(f"❌ Erro ao inserir: {e}")
 
 @bot.command()
-async def inserir2(ctx, *, jogadores_texto: str):
+async def inserir2(ctx, *, jogadores_texto: str = ""):
+    # Colagens grandes chegam como anexo (o Discord converte-as em message.txt); também aceita CSV.
+    anexos = [a for a in ctx.message.attachments if a.filename.lower().endswith((".txt", ".csv"))]
+    if not jogadores_texto.strip() and not anexos:
+        await ctx.send("❌ Indique os registos (`[data] nome score contribuicao [dano_boss]`, separados por `;`) ou anexe um ficheiro CSV.")
+        return
+
     await ctx.send("⏳ A processar os dados. Isto pode demorar um pouco...")
-    
-    registros = [reg.strip() for reg in jogadores_texto.split(";") if reg.strip()]
-    df = get_data_from_excel()
-    
-    total_carregados = 0
-    total_falhas = []
+    try:
+        ficheiros = [await a.read() for a in anexos]
+        # A data lógica é calculada uma única vez para o lote inteiro.
+        dia = data_logica()
 
-    for reg in registros:
-        try:
-            partes = reg.strip().split()
-            data_registro = data_logica()
-            nome = None
-            score = None
-            contribuicao = None
-            dano_boss = None
-
-            if len(partes) >= 3:
-                # Tenta primeiro com a data no formato YYYY/MM/DD
-                try:
-                    data_registro = datetime.strptime(partes[0], "%Y/%m/%d").date()
-                    nome = partes[1]
-                    score = int(partes[2])
-                    contribuicao = int(partes[3]) if len(partes) > 3 else None
-                    dano_boss = int(partes[4]) if len(partes) > 4 else None
-                except ValueError:
-                    # Se falhar, assume que não há data
-                    data_registro = data_logica()
-                    nome = partes[0]
-                    score = int(partes[1])
-                    contribuicao = int(partes[2])
-                    dano_boss = int(partes[3]) if len(partes) > 3 else None
-            else:
-                raise ValueError("Formato de registro inválido. Use: `[data] nome score contribuicao [dano_boss]`.")
-            
-            novo_registro = {"data": data_registro, "nome": nome, "score": score, "contribuicao": contribuicao, "dano_boss": dano_boss}
-            
-            if ((df['nome'] == nome) & (df['data'] == data_registro)).any():
-                df.loc[(df['nome'] == nome) & (df['data'] == data_registro), ['score', 'contribuicao', 'dano_boss']] = [score, contribuicao, dano_boss]
-            else:
-                df = pd.concat([df, pd.DataFrame([novo_registro])], ignore_index=True)
-            
-            total_carregados += 1
-        except Exception as e:
-            total_falhas.append(f"{reg.strip()}: {e}")
+        # Tokenização e validação vetorizadas fora do event loop, depois um único upsert.
+        lote, total_falhas = await executar(lambda: ingestao.analisar(dia, jogadores_texto, ficheiros))
+        await executar_escrita(lambda: base_dados.upsert(lote))
 
-    save_data_to_excel(df)
-    
-    msg_final = f"✅ Inserção concluída! Total de registros processados: {len(registros)}. Total de falhas: {len(total_falhas)}."
-    await ctx.send(msg_final)
+        msg_final = f"✅ Inserção concluída! Total de registros processados: {len(lote) + len(total_falhas)}. Total de falhas: {len(total_falhas)}."
+        await ctx.send(msg_final)
+
+        if total_falhas:
+            await enviar_paginas(ctx, total_falhas, cabecalho="❌ Falhas nos seguintes registros:\n", nome_ficheiro="falhas.txt")
+    except Exception as e:
+        await ctx.send(f"❌ Erro ao inserir: {e}")
+
+EXTENSOES_IMAGEM = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+@bot.command(name="inserirocr", aliases=["ocr"])
+async def inserir_ocr(ctx):
+    """Insere registos a partir de capturas de ecrã do roster (nome, score, contribuição)."""
+    imagens = [a for a in ctx.message.attachments if a.filename.lower().endswith(EXTENSOES_IMAGEM)]
+    if not imagens:
+        await ctx.send("❌ Anexe uma ou mais capturas de ecrã do roster da guilda.")
+        return
+    if not cliente_ocr.disponivel:
+        await ctx.send("❌ OCR não configurado (OCR_API_KEY em falta).")
+        return
 
-    if total_falhas:
-        falhas_str = "❌ Falhas nos seguintes registros:\n" + "\n".join(total_falhas)
-        for i in range(0, len(falhas_str), 1900):
-            await ctx.send(f"```{falhas_str[i:i + 1900]}```")
+    try:
+        await ctx.send(f"⏳ A reconhecer {len(imagens)} imagem(ns)...")
+
+        async def reconhecer(anexo):
+            return await cliente_ocr.reconhecer(await anexo.read(), anexo.filename)
+
+        # Todas as imagens em simultâneo (o cliente limita os pedidos e usa a cache por hash).
+        textos = await asyncio.gather(*(reconhecer(a) for a in imagens), return_exceptions=True)
+        linhas, falhas = [], []
+        for anexo, texto in zip(imagens, textos):
+            if isinstance(texto, (ErroOCR, asyncio.TimeoutError, aiohttp.ClientError)):
+                falhas.append(f"{anexo.filename}: {str(texto) or 'tempo esgotado'}")
+            elif isinstance(texto, BaseException):
+                raise texto
+            else:
+                linhas += extrair_registos(texto)
+
+        if not linhas:
+            falhas.append("Nenhuma linha `nome score contribuicao` reconhecida nas imagens.")
+        else:
+            # Mesmo caminho do !inserir2: validação em lote e um único upsert.
+            lote, falhas_lote = await executar(lambda: ingestao.analisar(data_logica(), "\n".join(linhas)))
+            falhas += falhas_lote
+            if not lote.empty:
+                await executar_escrita(lambda: base_dados.upsert(lote))
+                # Só os registos validados (as linhas rejeitadas aparecem nas falhas).
+                inseridos = [f"{r.nome} {r.score} {r.contribuicao}" for r in lote.itertuples(index=False)]
+                await enviar_paginas(ctx, inseridos, cabecalho=f"✅ {len(lote)} registos inseridos a partir de {len(imagens)} imagem(ns):\n",
+                                     nome_ficheiro="ocr.txt")
+
+        if falhas:
+            await enviar_paginas(ctx, falhas, cabecalho="❌ Falhas:\n", nome_ficheiro="falhas.txt")
+    except Exception as e:
+        await ctx.send(f"❌ Erro ao inserir: {e}")
 
 @bot.command(name="change", aliases=["alterar"])
 async def change_record(ctx, data_str: str, nome: str, score: int, contribuicao: int, dano_boss: int = None):
     try:
-        df = get_data_from_excel()
-        
         try:
             dt_obj = datetime.strptime(data_str, "%Y/%m/%d").date()
         except ValueError:
             await ctx.send("❌ Formato de data inválido. Por favor, use **AAAA/MM/DD**.")
             return
 
-        reg_existente = df[(df['nome'] == nome) & (df['data'] == dt_obj)]
-        
-        if reg_existente.empty:
+        if not await executar(lambda: base_dados.existe(nome, dt_obj)):
             await ctx.send(f"❌ Nenhum registro encontrado para o jogador **{nome}** na data **{data_str}**.")
             return
 
-        df.loc[reg_existente.index, 'score'] = score
-        df.loc[reg_existente.index, 'contribuicao'] = contribuicao
-        if dano_boss is not None:
-            df.loc[reg_existente.index, 'dano_boss'] = dano_boss
-
-        save_data_to_excel(df)
+        registo = {"nome": nome, "data": dt_obj, "score": score, "contribuicao": contribuicao, "dano_boss": dano_boss}
+        colunas = ["score", "contribuicao"] if dano_boss is None else ["score", "contribuicao", "dano_boss"]
+        await executar_escrita(lambda: base_dados.upsert([registo], colunas=colunas, apenas_existentes=True))
         
         await ctx.send(f"✅ Registro do jogador **{nome}** na data **{data_str}** foi atualizado.")
         
@@ -469,9 +523,8 @@ async def change_record(ctx, data_str: str, nome: str, score: int, contribuicao:
                 msg = await bot.wait_for('message', check=check, timeout=30.0)
                 novo_dano = int(msg.content)
 
-                df = get_data_from_excel()
-                df.loc[reg_existente.index, 'dano_boss'] = novo_dano
-                save_data_to_excel(df)
+                registo = {"nome": nome, "data": dt_obj, "dano_boss": novo_dano}
+                await executar_escrita(lambda: base_dados.upsert([registo], colunas=["dano_boss"], apenas_existentes=True))
                 await ctx.send(f"✅ Dano do boss para **{nome}** na data {data_str} atualizado para **{novo_dano}**.")
 
             except asyncio.TimeoutError:
@@ -484,7 +537,7 @@ async def change_record(ctx, data_str: str, nome: str, score: int, contribuicao:
 
 @bot.command(name="corrigirnome", aliases=["fixname"])
 async def corrigir_nome(ctx, nome_antigo: str, nome_novo: str):
-    try:
+    def corrigir():
         df = get_data_from_excel()
         
         df['nome'] = df['nome'].astype(str)
@@ -492,70 +545,66 @@ async def corrigir_nome(ctx, nome_antigo: str, nome_novo: str):
         registros_para_corrigir = df[df['nome'].str.lower() == nome_antigo.lower()]
         
         if registros_para_corrigir.empty:
-            await ctx.send(f"❌ Nenhum registro encontrado com o nome **{nome_antigo}**.")
-            return
+            return False
 
         df.loc[registros_para_corrigir.index, 'nome'] = nome_novo
         save_data_to_excel(df)
+        return True
+
+    try:
+        # Ler-modificar-gravar inteiro na thread de escrita.
+        if not await executar_escrita(corrigir):
+            await ctx.send(f"❌ Nenhum registro encontrado com o nome **{nome_antigo}**.")
+            return
         
         await ctx.send(f"✅ Nome alterado de **{nome_antigo}** para **{nome_novo}** em todos os registos.")
 
     except Exception as e:
         await ctx.send(f"❌ Erro ao corrigir nome: {e}")
 
+def _datas_comparacao(data_final, data_inicial):
+    """
+    Devolve (data_final, data_inicial) a comparar: as datas indicadas (AAAA/MM/DD)
+    ou os 2 dias mais recentes. Devolve None se não houver 2 dias de dados.
+    """
+    if data_final and data_inicial:
+        return (datetime.strptime(data_final.replace('/', '-'), "%Y-%m-%d").date(),
+                datetime.strptime(data_inicial.replace('/', '-'), "%Y-%m-%d").date())
+    datas_recentes = base_dados.dias_recentes(2)
+    if len(datas_recentes) < 2:
+        return None
+    return datas_recentes[0], datas_recentes[1]
+
+def _linhas_presenca(resultado):
+    """Formata as linhas de um ResultadoPresencas (uma por membro)."""
+    return [
+        f"{p.nome:<12} | {p.score_inicial:>5}⭢{p.score_final:<5} | {p.contribuicao_inicial:>7}⭢{p.contribuicao_final:<7} | {'✅' if p.cumpriu else '❌':<6}"
+        for p in resultado.tabela.itertuples(index=False)
+    ]
+
+async def _resultado_presencas(ctx, data_final=None, data_inicial=None):
+    """
+    Calcula o ResultadoPresencas usado por dif, dif2, dbattendance e dbnotok.
+    Envia a mensagem de erro e devolve None se não houver dados suficientes.
+    """
+    datas = await executar(_datas_comparacao, data_final, data_inicial)
+    if datas is None:
+        await ctx.send("❌ Não há dados suficientes para comparação (precisa de pelo menos 2 dias).")
+        return None
+    return await executar(lambda: base_dados.comparar_dias(*datas))
+
 @bot.command()
 async def dif(ctx, data_final: str = None, data_inicial: str = None):
     try:
-        df = get_data_from_excel()
-        if df.empty:
-            await ctx.send("❌ Não há dados suficientes para comparação.")
+        resultado = await _resultado_presencas(ctx, data_final, data_inicial)
+        if resultado is None:
             return
 
-        if data_final and data_inicial:
-            data_final_str = data_final.replace('/', '-')
-            data_inicial_str = data_inicial.replace('/', '-')
-        else:
-            datas_recentes = df["data"].sort_values(ascending=False).unique()
-            if len(datas_recentes) < 2:
-                await ctx.send("❌ Não há dados suficientes para comparação (precisa de pelo menos 2 dias).")
-                return
-            data_final_str = str(datas_recentes[0])
-            data_inicial_str = str(datas_recentes[1])
-
-        df_inicial = df[df["data"] == datetime.strptime(data_inicial_str, "%Y-%m-%d").date()]
-        df_final = df[df["data"] == datetime.strptime(data_final_str, "%Y-%m-%d").date()]
-
-        dados_iniciais = df_inicial.set_index("nome").to_dict("index")
-        dados_finais = df_final.set_index("nome").to_dict("index")
-        
-        linhas, count_ok, count_nok = [], 0, 0
-        
-        for nome, dados_f in dados_finais.items():
-            score_i = dados_iniciais.get(nome, {}).get("score", 0)
-            contrib_i = dados_iniciais.get(nome, {}).get("contribuicao", 0)
-
-            mudou = "✅" if (dados_f["score"] - score_i >= 2 and dados_f["contribuicao"] - contrib_i >= 1050) else "❌"
-            if mudou == "✅":
-                count_ok += 1
-            else:
-                count_nok += 1
-
-            linhas.append(f"{nome:<12} | {score_i:>5}⭢{dados_f['score']:<5} | {contrib_i:>7}⭢{dados_f['contribuicao']:<7} | {mudou:<6}")
-
-        cabecalho = f"Diferenças entre **{data_inicial_str}** e **{data_final_str}**:\n"
+        cabecalho = f"Diferenças entre **{resultado.data_inicial}** e **{resultado.data_final}**:\n"
         cabecalho += f"{'Nome':<12} | {'Score':<12} | {'Contribuição':<15} | {'Mudou?':<6}\n"
         cabecalho += "-" * 60 + "\n"
-        
-        texto_atual = cabecalho
-        for linha in linhas:
-            if len(texto_atual) + len(linha) + 50 > 1900:
-                await ctx.send(f"```{texto_atual}```")
-                texto_atual = cabecalho + linha + "\n"
-            else:
-                texto_atual += linha + "\n"
-        
-        rodape = f"\n\n✅ Cumpriram: {count_ok} | ❌ Não cumpriram: {count_nok}"
-        await ctx.send(f"```{texto_atual.strip()}{rodape}```")
+        rodape = f"\n\n✅ Cumpriram: {resultado.cumpriram} | ❌ Não cumpriram: {resultado.nao_cumpriram}"
+        await enviar_paginas(ctx, await executar(_linhas_presenca, resultado), cabecalho, rodape, nome_ficheiro="diferencas.txt")
 
     except Exception as e:
         await ctx.send(f"Erro ao gerar diferenças: {e}")
@@ -563,110 +612,78 @@ async def dif(ctx, data_final: str = None, data_inicial: str = None):
 @bot.command()
 async def dif2(ctx, data_final: str = None, data_inicial: str = None):
     try:
-        df = get_data_from_excel()
-        if df.empty:
-            await ctx.send("❌ Não há dados suficientes para comparação.")
+        resultado = await _resultado_presencas(ctx, data_final, data_inicial)
+        if resultado is None:
             return
 
-        if data_final and data_inicial:
-            data_final_str = data_final.replace('/', '-')
-            data_inicial_str = data_inicial.replace('/', '-')
-        else:
-            datas_recentes = df["data"].sort_values(ascending=False).unique()
-            if len(datas_recentes) < 2:
-                await ctx.send("❌ Não há dados suficientes para comparação (precisa de pelo menos 2 dias).")
-                return
-            data_final_str = str(datas_recentes[0])
-            data_inicial_str = str(datas_recentes[1])
-
-        df_inicial = df[df["data"] == datetime.strptime(data_inicial_str, "%Y-%m-%d").date()]
-        df_final = df[df["data"] == datetime.strptime(data_final_str, "%Y-%m-%d").date()]
-
-        dados_iniciais = df_inicial.set_index("nome").to_dict("index")
-        dados_finais = df_final.set_index("nome").to_dict("index")
-        
-        linhas, count_nok = [], 0
-        
-        for nome, dados_f in dados_finais.items():
-            if nome not in dados_iniciais:
-                continue
-            
-            score_i = dados_iniciais[nome]['score']
-            contrib_i = dados_iniciais[nome]['contribuicao']
-            
-            nao_cumpriu = (dados_f["score"] - score_i < 2) or (dados_f["contribuicao"] - contrib_i < 1050)
-            
-            if nao_cumpriu:
-                count_nok += 1
-                linhas.append(f"{nome:<12} | {score_i:>5}⭢{dados_f['score']:<5} | {contrib_i:>7}⭢{dados_f['contribuicao']:<7} | {'❌':<6}")
-
-        if not linhas:
+        # Só membros presentes nos dois dias.
+        nao_ok = resultado.filtrar(apenas_nao_cumpriram=True, apenas_com_inicial=True)
+        if nao_ok.vazio:
             await ctx.send("Todos os jogadores estão OK ✅")
             return
         
-        cabecalho = f"Jogadores NÃO cumpriram entre **{data_inicial_str}** e **{data_final_str}**:\n"
+        cabecalho = f"Jogadores NÃO cumpriram entre **{resultado.data_inicial}** e **{resultado.data_final}**:\n"
         cabecalho += f"{'Nome':<12} | {'Score':<12} | {'Contribuição':<15} | {'Mudou?':<6}\n"
         cabecalho += "-" * 60 + "\n"
-        
-        texto_atual = cabecalho
-        for linha in linhas:
-            if len(texto_atual) + len(linha) + 50 > 1900:
-                await ctx.send(f"```{texto_atual}```")
-                texto_atual = cabecalho + linha + "\n"
-            else:
-                texto_atual += linha + "\n"
-        
-        rodape = f"\n\n❌ Total não cumpriram: {count_nok}"
-        await ctx.send(f"```{texto_atual.strip()}{rodape}```")
+        rodape = f"\n\n❌ Total não cumpriram: {len(nao_ok.tabela)}"
+        await enviar_paginas(ctx, await executar(_linhas_presenca, nao_ok), cabecalho, rodape, nome_ficheiro="nao_ok.txt")
 
     except Exception as e:
         await ctx.send(f"❌ Erro ao gerar lista de não OK: {e}")
 
 @bot.command()
 async def atualizar2(ctx, *, jogadores_texto: str):
-    carregados = 0
-    falhas = []
-    df = get_data_from_excel()
     registros = [reg.strip() for reg in jogadores_texto.split(";") if reg.strip()]
 
-    for reg in registros:
-        try:
-            partes = reg.strip().split()
-            dt = data_logica()
-            dano_boss = None
-
-            if len(partes) >= 4:
-                # Tenta processar com data
-                try:
-                    data_str, nome, score, contribuicao = partes[:4]
-                    dt = datetime.strptime(data_str, "%Y/%m/%d").date()
-                    if len(partes) > 4:
-                        dano_boss = int(partes[4])
-                except ValueError:
-                    # Se falhar, processa sem data
-                    nome, score, contribuicao = partes[:3]
-                    if len(partes) > 3:
-                        dano_boss = int(partes[3])
-            elif len(partes) == 3:
-                nome, score, contribuicao = partes
-            else:
-                falhas.append(f"{reg.strip()}: Formato inválido. Use `nome score contribuicao [dano_boss] [data]`.")
-                continue
+    def processar():
+        lote = []
+        falhas = []
+
+        for reg in registros:
+            try:
+                partes = reg.strip().split()
+                dt = data_logica()
+                dano_boss = None
+
+                if len(partes) >= 4:
+                    # Tenta processar com data
+                    try:
+                        data_str, nome, score, contribuicao = partes[:4]
+                        dt = datetime.strptime(data_str, "%Y/%m/%d").date()
+                        if len(partes) > 4:
+                            dano_boss = int(partes[4])
+                    except ValueError:
+                        # Se falhar, processa sem data
+                        nome, score, contribuicao = partes[:3]
+                        if len(partes) > 3:
+                            dano_boss = int(partes[3])
+                elif len(partes) == 3:
+                    nome, score, contribuicao = partes
+                else:
+                    falhas.append(f"{reg.strip()}: Formato inválido. Use `nome score contribuicao [dano_boss] [data]`.")
+                    continue
             
-            score = int(score)
-            contribuicao = int(contribuicao)
-            if dano_boss is not None:
-                dano_boss = int(dano_boss)
+                score = int(score)
+                contribuicao = int(contribuicao)
+                if dano_boss is not None:
+                    dano_boss = int(dano_boss)
             
-            if ((df['nome'] == nome) & (df['data'] == dt)).any():
-                df.loc[(df['nome'] == nome) & (df['data'] == dt), ['score', 'contribuicao', 'dano_boss']] = [score, contribuicao, dano_boss]
-                carregados += 1
-            else:
-                falhas.append(f"{nome} não encontrado para {dt.strftime('%Y/%m/%d')}")
-        except Exception as e:
-            falhas.append(f"{reg.strip()}: {e}")
+                lote.append({"nome": nome, "data": dt, "score": score, "contribuicao": contribuicao, "dano_boss": dano_boss})
+            except Exception as e:
+                falhas.append(f"{reg.strip()}: {e}")
+        return lote, falhas
+
+    lote, falhas = await executar(processar)
+
+    # Só atualiza registos existentes, com um único upsert vetorizado.
+    nao_encontrados = set(await executar_escrita(lambda: base_dados.upsert(lote, apenas_existentes=True)))
+    carregados = 0
+    for registo in lote:
+        if (registo["nome"], registo["data"]) in nao_encontrados:
+            falhas.append(f"{registo['nome']} não encontrado para {registo['data'].strftime('%Y/%m/%d')}")
+        else:
+            carregados += 1
 
-    save_data_to_excel(df)
     msg = f"✅ Registros atualizados com sucesso: {carregados}\n"
     if falhas:
         msg += "❌ Falhas:\n" + "\n".join(falhas)
@@ -675,61 +692,24 @@ async def atualizar2(ctx, *, jogadores_texto: str):
 @bot.command()
 async def dbattendance(ctx):
     try:
-        df = get_data_from_excel()
-        if df.empty:
-            await ctx.send("❌ Não há dados suficientes para gerar attendance.")
+        # Attendance já materializada (ver presencas.py): só consulta, sem recalcular o histórico.
+        resultado = await _resultado_presencas(ctx)
+        if resultado is None:
             return
 
-        df['data'] = pd.to_datetime(df['data'])
-        datas_recentes = df['data'].sort_values(ascending=False).unique()
-        if len(datas_recentes) < 2:
-            await ctx.send("❌ Não há dados suficientes para gerar attendance (precisa de pelo menos 2 dias).")
-            return
-
-        hoje_date = pd.to_datetime(datas_recentes[0]).date()
-        ontem_date = pd.to_datetime(datas_recentes[1]).date()
-
-        df_hoje = df[df['data'].dt.date == hoje_date]
-        df_ontem = df[df['data'].dt.date == ontem_date]
-
-        dados_hoje = df_hoje.set_index('nome').to_dict('index')
-        dados_ontem = df_ontem.set_index('nome').to_dict('index')
-
-        linhas = []
-        count_ok, count_nok = 0, 0
-        for nome, dados_h in dados_hoje.items():
-            score_o = dados_ontem.get(nome, {}).get('score', 0)
-            contrib_o = dados_ontem.get(nome, {}).get('contribuicao', 0)
-            
-            mudou = "✅" if (dados_h['score'] - score_o >= 2 and dados_h['contribuicao'] - contrib_o >= 1050) else "❌"
-
-            if mudou == "✅":
-                count_ok += 1
-            else:
-                count_nok += 1
-            
-            linhas.append(f"{nome:<12} | {score_o:>5}⭢{dados_h['score']:<5} | {contrib_o:>7}⭢{dados_h['contribuicao']:<7} | {mudou:<6}")
-
         canal_id = CANAL_SCORE_ID # Usando a variável global CANAL_SCORE_ID
         canal = bot.get_channel(canal_id)
         if not canal:
             await ctx.send("Canal de attendance não encontrado.")
             return
 
-        cabecalho = f"📅 Attendance para {hoje_date}:\n"
+        cabecalho = f"📅 Attendance para {resultado.data_final}:\n"
         cabecalho += f"{'Nome':<12} | {'Score':<12} | {'Contribuição':<15} | {'Status':<6}\n"
         cabecalho += "-" * 55 + "\n"
-        
-        texto_atual = cabecalho
-        for linha in linhas:
-            if len(texto_atual) + len(linha) + 50 > 1900:
-                await canal.send(f"```{texto_atual}```")
-                texto_atual = cabecalho + linha + "\n"
-            else:
-                texto_atual += linha + "\n"
-        
-        rodape = f"\n\n✅ Cumpriram: {count_ok} | ❌ Não cumpriram: {count_nok}"
-        await canal.send(f"```{texto_atual.strip()}{rodape}```")
+        rodape = f"\n\n✅ Cumpriram: {resultado.cumpriram} | ❌ Não cumpriram: {resultado.nao_cumpriram}"
+        # Relatório longo num canal partilhado: cede a vez aos alertas de bosses.
+        await enviar_paginas(canal, await executar(_linhas_presenca, resultado), cabecalho, rodape,
+                             nome_ficheiro="attendance.txt", prioridade=envios.BAIXA)
 
     except Exception as e:
         await ctx.send(f"Erro ao gerar attendance: {e}")
@@ -737,55 +717,20 @@ async def dbattendance(ctx):
 @bot.command()
 async def dbnotok(ctx):
     try:
-        df = get_data_from_excel()
-        if df.empty:
-            await ctx.send("❌ Não há dados suficientes para comparação.")
-            return
-
-        df['data'] = pd.to_datetime(df['data'])
-        datas_recentes = df['data'].sort_values(ascending=False).unique()
-        if len(datas_recentes) < 2:
-            await ctx.send("❌ Não há dados suficientes para comparação (precisa de pelo menos 2 dias).")
+        resultado = await _resultado_presencas(ctx)
+        if resultado is None:
             return
 
-        hoje_date = pd.to_datetime(datas_recentes[0]).date()
-        ontem_date = pd.to_datetime(datas_recentes[1]).date()
-
-        df_hoje = df[df['data'].dt.date == hoje_date]
-        df_ontem = df[df['data'].dt.date == ontem_date]
-
-        dados_hoje = df_hoje.set_index('nome').to_dict('index')
-        dados_ontem = df_ontem.set_index('nome').to_dict('index')
-
-        linhas = []
-        count_nok = 0
-        for nome, dados_h in dados_hoje.items():
-            score_o = dados_ontem.get(nome, {}).get('score', 0)
-            contrib_o = dados_ontem.get(nome, {}).get('contribuicao', 0)
-            
-            mudou = "✅" if (dados_h['score'] - score_o >= 2 and dados_h['contribuicao'] - contrib_o >= 1050) else "❌"
-            if mudou == "❌":
-                count_nok += 1
-                linhas.append(f"{nome:<12} | {score_o:>5}⭢{dados_h['score']:<5} | {contrib_o:>7}⭢{dados_h['contribuicao']:<7} | {mudou:<6}")
-
-        if not linhas:
+        nao_ok = resultado.filtrar(apenas_nao_cumpriram=True)
+        if nao_ok.vazio:
             await ctx.send("Todos os jogadores estão OK ✅")
             return
 
         cabecalho = f"📅 Jogadores não OK hoje\n"
         cabecalho += f"{'Nome':<12} | {'Score':<12} | {'Contribuição':<15} | {'Status':<6}\n"
         cabecalho += "-" * 55 + "\n"
-
-        texto_atual = cabecalho
-        for linha in linhas:
-            if len(texto_atual) + len(linha) + 50 > 1900:
-                await ctx.send(f"```{texto_atual}```")
-                texto_atual = cabecalho + linha + "\n"
-            else:
-                texto_atual += linha + "\n"
-
-        rodape = f"\n\n❌ Total não cumpriram: {count_nok}"
-        await ctx.send(f"```{texto_atual.strip()}{rodape}```")
+        rodape = f"\n\n❌ Total não cumpriram: {len(nao_ok.tabela)}"
+        await enviar_paginas(ctx, await executar(_linhas_presenca, nao_ok), cabecalho, rodape, nome_ficheiro="nao_ok.txt")
 
     except Exception as e:
         await ctx.send(f"❌ Erro ao gerar lista de não OK: {e}")
@@ -793,30 +738,20 @@ async def dbnotok(ctx):
 @bot.command()
 async def consultar2(ctx):
     try:
-        df = get_data_from_excel()
+        df = await executar(lambda: get_data_from_excel().sort_values(by=["data", "nome"]))
         if df.empty:
             await ctx.send("❌ Nenhum jogador encontrado na DB.")
             return
 
-        df = df.sort_values(by=["data", "nome"])
         total = len(df)
         
-        texto_atual = ""
-        for _, row in df.iterrows():
-            linha = f"{row['data']} | {row['nome']:<10} | {row['score']:>5} | {row['contribuicao']:>12} | {row['dano_boss']}\n"
-            if len(texto_atual) + len(linha) + 50 > 1900:
-                await ctx.send(f"```{texto_atual}```")
-                texto_atual = "Data           | Nome         | Score | Contribuição | Dano Boss\n"
-                texto_atual += "-"*65 + "\n"
-                texto_atual += linha
-            else:
-                if texto_atual == "":
-                    texto_atual += "Data           | Nome         | Score | Contribuição | Dano Boss\n"
-                    texto_atual += "-"*65 + "\n"
-                texto_atual += linha
-
-        if texto_atual:
-            await ctx.send(f"```{texto_atual.strip()}```")
+        cabecalho = "Data           | Nome         | Score | Contribuição | Dano Boss\n"
+        cabecalho += "-"*65 + "\n"
+        linhas = (
+            f"{row.data:%Y-%m-%d} | {row.nome:<10} | {row.score:>5} | {row.contribuicao:>12} | {row.dano_boss}"
+            for row in df.itertuples(index=False)
+        )
+        await enviar_paginas(ctx, linhas, cabecalho, nome_ficheiro="consulta.txt")
         await ctx.send(f"✅ Mostrando {total} jogadores no total.")
     except Exception as e:
         await ctx.send(f"❌ Erro ao consultar a DB: {e}")
@@ -824,28 +759,41 @@ async def consultar2(ctx):
 @bot.command()
 async def remove(ctx, nome: str, data: str = None):
     try:
-        df = get_data_from_excel()
-        if df.empty:
-            msg = await ctx.send("❌ Base de dados vazia. Nada a remover.")
-            await apagar_mensagem(msg)
-            return
-
+        dt = None
         if data:
             try:
                 dt = datetime.strptime(data, "%Y/%m/%d").date()
-                rows_to_remove = df[(df['nome'].str.lower() == nome.lower()) & (df['data'] == dt)]
             except ValueError:
                 await ctx.send("❌ Formato de data inválido. Use AAAA/MM/DD.")
                 return
-        else:
-            rows_to_remove = df[df['nome'].str.lower() == nome.lower()]
 
-        if rows_to_remove.empty:
+        def remover():
+            df = get_data_from_excel()
+            if df.empty:
+                return None
+
+            if dt:
+                rows_to_remove = df[(df['nome'].str.lower() == nome.lower()) & (df['data'] == datetime.combine(dt, time()))]
+            else:
+                rows_to_remove = df[df['nome'].str.lower() == nome.lower()]
+
+            if rows_to_remove.empty:
+                return False
+            df.drop(rows_to_remove.index, inplace=True)
+            save_data_to_excel(df)
+            return True
+
+        # Ler-modificar-gravar inteiro na thread de escrita.
+        removido = await executar_escrita(remover)
+        if removido is None:
+            msg = await ctx.send("❌ Base de dados vazia. Nada a remover.")
+            await apagar_mensagem(msg)
+            return
+
+        if not removido:
             msg = await ctx.send(f"Jogador {nome} não encontrado.")
             await apagar_mensagem(msg)
         else:
-            df.drop(rows_to_remove.index, inplace=True)
-            save_data_to_excel(df)
             msg = await ctx.send(f"Jogador {nome} removido da base de dados.")
             await apagar_mensagem(msg)
         
@@ -872,8 +820,11 @@ async def apagardb(ctx):
 
     try:
         reaction, user = await bot.wait_for("reaction_add", timeout=30.0, check=check)
-        df_vazio = pd.DataFrame(columns=["data", "nome", "score", "contribuicao", "dano_boss"])
-        save_data_to_excel(df_vazio)
+        def apagar():
+            import pandas as pd  # o pandas só é importado quando é preciso (ver arranque.py)
+            save_data_to_excel(pd.DataFrame(columns=["data", "nome", "score", "contribuicao", "dano_boss"]))
+
+        await executar_escrita(apagar)
         await ctx.send("✅ Base de dados resetada e recriada com sucesso!")
 
     except asyncio.TimeoutError:
@@ -892,7 +843,10 @@ async def commands_cmd(ctx):
 → Insere ou atualiza um registro. A data e o dano são opcionais. Se o Dano_Boss não for fornecido, o bot irá questionar.
 
 `!inserir2 <dados_separados_por_;>`
-→ Insere múltiplos registros (em grupos de 25).
+→ Insere múltiplos registros de uma vez. Também aceita um ficheiro .txt ou .csv anexado (com cabeçalho nome,score,...).
+
+`!inserirocr` (com capturas de ecrã anexadas)
+→ Lê o roster das imagens por OCR e insere nome, score e contribuição na data de hoje.
 
 `!change Data Nome NovoScore NovaContribuicao [Dano_Boss]`
 → Altera um registro específico. O dano é opcional. Se não for fornecido, o bot irá questionar.
@@ -923,8 +877,8 @@ async def commands_cmd(ctx):
 `!consultar2`
 → Exibe todos os registros salvos no arquivo, ordenados por data e nome.
 
-`!exportar_excel <AAAA/MM/DD> [AAAA/MM/DD]`
-→ Extrai um ficheiro Excel com os dados de um dia ou um período de datas.
+`!exportar_excel <AAAA/MM/DD> [AAAA/MM/DD] [xlsx|csv|parquet]`
+→ Extrai um ficheiro (Excel por omissão, ou CSV/Parquet) com os dados de um dia ou um período de datas.
 
 🔹 **Funcionalidades Adicionais**
 `!perguntar <pergunta>`
@@ -941,17 +895,30 @@ async def commands_cmd(ctx):
 
 `!ofdhoje`
 → (Do eventos.py) Mostra as Dungeons Overflow abertas no jogo hoje.
+
+`!recarregartabelas`
+→ Recarrega os bosses e as dungeons OFD de tabelas.json sem reiniciar o bot (cria o ficheiro se não existir).
+
+`!perf [bloqueios|reset]`
+→ Tempos dos comandos, tarefas e chamadas a disco/Sheets/HTTP, e bloqueios do event loop.
 """
-    await ctx.send(texto)
+    # O texto passa o limite de 2000 caracteres de uma mensagem: vai em várias.
+    await enviar_paginas(ctx, texto.strip("\n").split("\n"), bloco="", nome_ficheiro="comandos.txt")
 
 @bot.command(name="exportar_excel")
 @commands.has_permissions(administrator=True)
-async def excel_export(ctx, data_inicio_str: str, data_fim_str: str = None):
-    """Exporta um ficheiro Excel com os dados de uma data ou período de datas."""
-    caminho_arquivo = "export.xlsx"
+async def excel_export(ctx, data_inicio_str: str, data_fim_str: str = None, formato: str = "xlsx"):
+    """Exporta os dados de uma data ou período de datas (xlsx, csv ou parquet)."""
     try:
-        df = get_data_from_excel()
-        if df.empty:
+        # Permite `!exportar_excel 2025/01/01 csv` sem data de fim.
+        if data_fim_str and data_fim_str.lower() in FORMATOS_EXPORTACAO:
+            data_fim_str, formato = None, data_fim_str
+        formato = formato.lower()
+        if formato not in FORMATOS_EXPORTACAO:
+            await ctx.send(f"❌ Formato inválido. Use: {', '.join(FORMATOS_EXPORTACAO)}.")
+            return
+
+        if not await executar(lambda: base_dados.dias_recentes(1)):
             await ctx.send("❌ Base de dados vazia. Nada para exportar.")
             return
 
@@ -961,30 +928,94 @@ async def excel_export(ctx, data_inicio_str: str, data_fim_str: str = None):
             if data_inicio > data_fim:
                 await ctx.send("❌ A data de início não pode ser posterior à data de fim.")
                 return
-            df_filtrado = df[(df['data'] >= data_inicio) & (df['data'] <= data_fim)]
-            nome_arquivo = f"guild_data_{data_inicio.strftime('%Y-%m-%d')}_to_{data_fim.strftime('%Y-%m-%d')}.xlsx"
+            df_filtrado = await executar(lambda: base_dados.intervalo(data_inicio, data_fim))
+            nome_arquivo = f"guild_data_{data_inicio.strftime('%Y-%m-%d')}_to_{data_fim.strftime('%Y-%m-%d')}.{formato}"
             mensagem = f"✅ Exportando dados para o período de **{data_inicio.strftime('%Y-%m-%d')}** a **{data_fim.strftime('%Y-%m-%d')}**."
         else:
-            df_filtrado = df[df['data'] == data_inicio]
-            nome_arquivo = f"guild_data_{data_inicio.strftime('%Y-%m-%d')}.xlsx"
+            df_filtrado = await executar(lambda: base_dados.intervalo(data_inicio))
+            nome_arquivo = f"guild_data_{data_inicio.strftime('%Y-%m-%d')}.{formato}"
             mensagem = f"✅ Exportando dados para a data **{data_inicio.strftime('%Y-%m-%d')}**."
         
         if df_filtrado.empty:
             await ctx.send(f"❌ Não foram encontrados dados para o período especificado.")
             return
         
-        df_filtrado.to_excel(caminho_arquivo, index=False)
-        
-        with open(caminho_arquivo, "rb") as f:
-            await ctx.send(mensagem, file=discord.File(f, filename=nome_arquivo))
+        # O ficheiro é gerado num buffer em memória, fora do event loop, e
+        # enviado diretamente (exportações em simultâneo não partilham ficheiros).
+        buffer = await executar(lambda: exportacao.exportar(df_filtrado, formato))
+        await ctx.send(mensagem, file=discord.File(buffer, filename=nome_arquivo))
             
     except ValueError:
         await ctx.send("❌ Formato de data inválido. Use AAAA/MM/DD.")
     except Exception as e:
         await ctx.send(f"❌ Ocorreu um erro ao exportar o Excel: {e}")
-    finally:
-        if os.path.exists(caminho_arquivo):
-            os.remove(caminho_arquivo)
+
+@bot.command(name="recarregartabelas", aliases=["reloadtables"])
+@commands.has_permissions(administrator=True)
+async def recarregartabelas(ctx):
+    if not os.path.exists(tabelas.caminho):
+        try:
+            await asyncio.to_thread(tabelas.exportar)
+        except (OSError, TypeError, ValueError) as e:
+            await ctx.send(f"❌ Não foi possível criar '{tabelas.caminho}': {e}")
+            return
+        await ctx.send(f"📄 '{tabelas.caminho}' criado a partir das tabelas atuais. "
+                       "Edite-o e volte a usar o comando (ou aguarde pela vigia do ficheiro).")
+        return
+
+    try:
+        bosses_alterados, dias_alterados = await tabelas.recarregar(forcar=True)
+    except TabelasInvalidas as e:
+        await enviar_paginas(ctx, e.erros, cabecalho="❌ Tabelas inválidas, nada foi alterado:\n",
+                             nome_ficheiro="erros_tabelas.txt")
+        return
+    except OSError as e:
+        await ctx.send(f"❌ Não foi possível ler '{tabelas.caminho}': {e}")
+        return
+
+    await ctx.send(
+        f"✅ Tabelas recarregadas (versão {tabelas.versao}): {len(tabelas.bosses)} bosses, "
+        f"{len(bosses_alterados)} alterado(s); {sum(map(len, tabelas.dungeons.values()))} dungeons OFD, "
+        f"{len(dias_alterados)} dia(s) alterado(s)."
+    )
+
+@bot.command(name="perf")
+@commands.has_permissions(administrator=True)
+async def perf(ctx, opcao: str = None):
+    """
+    Estatísticas de desempenho (ver desempenho.py). `!perf bloqueios` mostra
+    as pilhas dos últimos bloqueios do event loop e `!perf reset` limpa tudo.
+    """
+    if opcao == "reset":
+        desempenho.limpar()
+        await ctx.send("✅ Estatísticas de desempenho limpas.")
+        return
+
+    bloqueios = list(desempenho.vigia.bloqueios)
+    if opcao == "bloqueios":
+        if not bloqueios:
+            await ctx.send("✅ Nenhum bloqueio do event loop detetado.")
+            return
+        linhas = []
+        for bloqueio in reversed(bloqueios):
+            linhas.append(f"--- {datetime.fromtimestamp(bloqueio['inicio']):%Y-%m-%d %H:%M:%S} "
+                          f"(~{bloqueio['duracao']:.2f} s)")
+            linhas += bloqueio["pilha"].rstrip("\n").split("\n")
+        await enviar_paginas(ctx, linhas, nome_ficheiro="bloqueios.txt")
+        return
+
+    estado = servidor_saude.estado()
+    latencia = estado["latencia_gateway"]
+    rodape = (
+        f"\n\nEvent loop: atraso {estado['atraso_loop'] * 1000:.0f} ms "
+        f"(máx. {estado['atraso_loop_maximo'] * 1000:.0f} ms), "
+        f"{desempenho.vigia.total} bloqueio(s) > {desempenho.LIMIAR_BLOQUEIO:g} s"
+        f"\nGateway: {'-' if latencia is None else f'{latencia * 1000:.0f} ms'}"
+    )
+    cabecalho, *linhas = desempenho.relatorio()
+    if not linhas:
+        linhas = ["(ainda sem medições)"]
+    await enviar_paginas(ctx, linhas, cabecalho=cabecalho + "\n", rodape=rodape, nome_ficheiro="perf.txt")
 
 @bot.command(name='perguntar')
 async def perguntar(ctx, *, prompt: str = None):
@@ -1006,10 +1037,6 @@ async def perguntar(ctx, *, prompt: str = None):
 
     async with ctx.typing():
         try:
-            # Usa o modelo de texto por padrão
-            model_name = 'gemini-pro'
-            content_parts = []
-
             # Verifica se há uma imagem para processar
             if image_data:
                 # Informa o utilizador que o modelo de visão não está disponível
@@ -1018,17 +1045,20 @@ async def perguntar(ctx, *, prompt: str = None):
                     delete_after=10
                 )
             
-            if prompt:
-                content_parts.append(prompt)
-            else:
+            if not prompt:
                 # Se não há texto e a imagem não pode ser processada, encerra.
                 return
 
-            model = gemini.GenerativeModel(model_name)
-            response = model.generate_content(content_parts)
-            
-            await ctx.send(response.text)
+            # Pedido assíncrono: uma resposta lenta já não bloqueia o bot (nem os alertas de bosses).
+            # O texto aparece à medida que é gerado e continua em novas mensagens depois de 2000 caracteres.
+            pedacos = assistente.responder(ctx.author.id, prompt)
+            try:
+                await enviar_progressivo(ctx, pedacos)
+            finally:
+                await pedacos.aclose()
             
+        except FilaCheia:
+            await ctx.send("⏳ Já tem várias perguntas à espera de resposta. Aguarde que terminem.")
         except Exception as e:
             await ctx.send(f"❌ Ocorreu um erro: {e}")
 
@@ -1036,63 +1066,102 @@ async def perguntar(ctx, *, prompt: str = None):
 # --- 7. EVENTOS E INICIALIZAÇÃO DO BOT (CORRIGIDO) ---
 # ----------------------------------------------------------------------
 
-@bot.event
-async def on_ready():
-    # --- PRINTS DE CONEXÃO INICIAIS ---
-    print(f"🤖 Bot conectado como {bot.user}")
-    print(f'Bot logado como: {bot.user} (ID: {bot.user.id})')
-    print('-------------------------------------------')
-
-    # 🚨 PASSO CRÍTICO: CARREGAR COGS EXISTENTES 🚨
-    # A ordem é importante. 'score.py' falhava porque não estava aqui.
+aquecimento = None
 
-    # Score Cog (Para !score e !dia)
-    try:
-        await bot.load_extension('score')
-        print("✅ Módulo 'score.py' carregado com sucesso. (!score e !dia disponíveis)")
-    except Exception as e:
-        print(f"❌ Falha CRÍTICA ao carregar 'score.py': {e}")
+async def aquecer():
+    """
+    Carrega os subsistemas pesados em segundo plano depois do on_ready, para
+    que o primeiro comando não pague o custo, e mostra o relatório de arranque.
+    """
+    def carregar_dados():
+        importar("pandas")
+        criar(base_dados)
+        with medir("carregar base de dados"):
+            base_dados.carregar()
+        criar(exportacao)
+        criar(ingestao)
 
-    # Boss Cog
     try:
-        # Carrega a Cog de Bosses (contém !boss, !testealerta, e os loops automáticos)
-        await bot.load_extension('boss')
-        print("✅ Cog 'boss.py' carregado com sucesso.")
+        await asyncio.to_thread(carregar_dados)
+        with medir("preparar modelo Gemini"):
+            await asyncio.to_thread(assistente.modelo.preparar)
     except Exception as e:
-        print(f"❌ Falha ao carregar 'boss.py': {e}")
-        
-    # Eventos Cog
+        print(f"❌ Falha no aquecimento: {e}")
+    print(relatorio())
+
+# Cogs independentes entre si: carregadas em paralelo, uma única vez, no setup_hook.
+COGS = [
+    ('score', "Módulo 'score.py' (!score e !dia)"),
+    ('boss', "Cog 'boss.py' (!boss, !testealerta e loops automáticos)"),
+    ('eventos', "Cog 'eventos.py' (tradução, etc.)"),
+    ('react', "Cog 'react.py'"),  # A Cog React acede ao cliente GSpread via bot.gc
+    ('DMsubjugation', "Cog 'DMsubjugation.py' (alertas de Boss Subjugation)"),
+]
+bot.tempos_cogs = {}
+
+async def carregar_cog(nome, carregar):
+    """Carrega uma cog e regista a duração; devolve a exceção em caso de falha."""
+    inicio = asyncio.get_running_loop().time()
     try:
-        # Carrega a Cog de Eventos (tradução, etc.)
-        await bot.load_extension('eventos')
-        print("✅ Cog 'eventos.py' carregado com sucesso.")
+        with medir(f"cog {nome}"):
+            await carregar()
+        return None
     except Exception as e:
-        print(f"❌ Falha ao carregar 'eventos.py': {e}")
+        return e
+    finally:
+        bot.tempos_cogs[nome] = asyncio.get_running_loop().time() - inicio
+
+async def carregar_cogs():
+    cargas = [
+        (nome, descricao, lambda nome=nome: bot.load_extension(nome))
+        for nome, descricao in COGS if nome not in bot.extensions
+    ]
+    if bot.get_cog('Investigacao') is None:
+        # Módulo de investigação (Web Scraper), com o ID do canal ALERTA
+        cargas.append(('Investigacao', "Módulo 'Investigacao' (Web Scraper)",
+                       lambda: bot.add_cog(Investigacao(bot, ID_CANAL_ALERTA))))
+
+    erros = await asyncio.gather(*(carregar_cog(nome, carregar) for nome, _, carregar in cargas))
+    for (nome, descricao, _), erro in zip(cargas, erros):
+        ms = bot.tempos_cogs[nome] * 1000
+        if erro is None:
+            print(f"✅ {descricao} carregado com sucesso ({ms:.0f} ms).")
+        else:
+            print(f"❌ Falha ao carregar {descricao}: {erro.__class__.__name__}: {erro} ({ms:.0f} ms)")
 
-    # React Cog
-    try:
-        # A Cog React deve aceder ao cliente GSpread via bot.gc_client
-        await bot.load_extension('react')
-        print("✅ Cog 'react.py' carregado com sucesso.")
-    except Exception as e:
-        print(f"❌ Falha ao carregar 'react.py': {e}")
+async def setup_hook():
+    """
+    Preparação feita uma única vez, depois do login e antes da ligação ao
+    gateway. Ao contrário do on_ready, não volta a correr nas reconexões.
+    """
+    # O gspread é autenticado aqui, fora do event loop, e não no import do bot.
+    with medir("autenticar gspread"):
+        bot.gc = await asyncio.to_thread(autenticar_gspread)
+    configuracoes_ids.gc = bot.gc
+
+    # Abre a folha 'ConfiguracoesIDs' uma única vez e guarda-a em cache,
+    # antes de as cogs lerem os IDs de setup persistentes.
+    with medir("carregar folha ConfiguracoesIDs"):
+        await configuracoes_ids.carregar()
+
+    # As tabelas de tabelas.json (se existir) substituem as do boss.py e do
+    # eventos.py antes de as cogs arrancarem; depois o ficheiro fica vigiado.
+    await vigiar_tabelas()
+    if not vigiar_tabelas.is_running():
+        vigiar_tabelas.start()
+
+    await carregar_cogs()
+
+    # Sem a cog 'boss.py' (e os seus loops), os alertas de bosses passam a ser
+    # enviados pelo check_bosses daqui.
+    if 'boss' not in bot.extensions and not check_bosses.is_running():
+        # Só é vigiada pelo health check quando é ela a enviar os alertas. O loop
+        # acorda no máximo a cada ESPERA_MAXIMA: depois disso (com margem), parou
+        # ou terminou com erro.
+        servidor_saude.vigiar("check_bosses", ESPERA_MAXIMA.total_seconds() + 300)
+        check_bosses.start()
+        print("✅ Task 'check_bosses' iniciada (cog 'boss.py' indisponível).")
 
-    # --- INCLUSÃO DO NOVO MÓDULO DE INVESTIGAÇÃO (Web Scraper) ---
-    try:
-        # Carrega a classe Investigacao, passando o ID do canal ALERTA
-        await bot.add_cog(Investigacao(bot, ID_CANAL_ALERTA))
-        print("✅ Módulo 'Investigacao' (Web Scraper) carregado e monitoramento iniciado.")
-    except Exception as e:
-        print(f"❌ Falha ao carregar Módulo 'Investigacao': {e.__class__.__name__}: {e}")
-        
-    # 🌟 NOVO CÓDIGO: DMSubjugation Cog 🌟
-    try:
-        # Carrega a Cog para alertas agendados/manuais de Boss Subjugation (DMsubjugation.py)
-        await bot.load_extension('DMsubjugation')
-        print("✅ Cog 'DMsubjugation.py' (Alerta Boss) carregada com sucesso.")
-    except Exception as e:
-        print(f"❌ Falha ao carregar 'DMsubjugation.py': {e}")
-        
     # INICIAR TAREFAS AGENDADAS (Score e OFD)
     
     # Se a task 'scheduled_score_check' estiver no bot.py, inicia.
@@ -1103,9 +1172,46 @@ async def on_ready():
         scheduled_score_check.start() 
         print("✅ Task 'scheduled_score_check' iniciada.")
         
-    # Inicia o servidor web em uma thread separada para o health check
-    threading.Thread(target=run_server).start()
-    print("✅ Servidor Web (Health Check) iniciado em thread separada.")
-    
-bot.run(TOKEN)
+    if not compactar_base_dados.is_running():
+        compactar_base_dados.start()
+        print("✅ Task 'compactar_base_dados' iniciada.")
+
+    # Servidor do health check e das métricas, no mesmo event loop do bot
+    try:
+        await servidor_saude.iniciar()
+        print(f"✅ Servidor Web (Health Check e /metrics) iniciado na porta {servidor_saude.porta}.")
+    except OSError as e:
+        print(f"❌ Falha ao iniciar o Servidor Web (Health Check): {e}")
+
+    # Deteção de bloqueios do event loop (mostra a pilha na consola; ver !perf),
+    # sobre o batimento do monitor do health check, que já está a correr.
+    desempenho.vigia.iniciar(servidor_saude.monitor)
+
+bot.setup_hook = setup_hook
+
+@bot.event
+async def on_ready():
+    # --- PRINTS DE CONEXÃO INICIAIS ---
+    print(f"🤖 Bot conectado como {bot.user}")
+    print(f'Bot logado como: {bot.user} (ID: {bot.user.id})')
+    print('-------------------------------------------')
+
+    # O on_ready repete-se a cada reconexão ao gateway: a preparação está no
+    # setup_hook e o aquecimento só corre na primeira vez.
+    global aquecimento
+    if aquecimento is None:
+        marcar("ligação ao Discord (on_ready)")
+        aquecimento = asyncio.create_task(aquecer())
+
+try:
+    bot.run(TOKEN)
+finally:
+    # Termina as escritas pendentes e compacta o log num snapshot antes de sair.
+    execucao.fechar()
+    if base_dados.criado:
+        base_dados.fechar()
+    try:
+        configuracoes_ids.fechar()
+    except Exception as e:
+        print(f"❌ Falha ao escrever na folha 'ConfiguracoesIDs': {e}")
 
@@ -0,0 +1,235 @@
+"""
+Instrumentação do bot: tempos dos comandos e das tarefas, spans de I/O
+(disco, Sheets, HTTP) e um vigia que deteta bloqueios do event loop.
+
+Os tempos ficam em histogramas em memória, com baldes fixos como no
+Prometheus; são mostrados pelo !perf e expostos em /metrics (ver saude.py).
+O registo é thread-safe: os spans de disco e de Sheets correm nas threads de
+execucao.py e do asyncio.to_thread.
+"""
+import functools
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+# Limites superiores dos baldes dos histogramas (segundos).
+BALDES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# O event loop é dado como bloqueado quando não acorda durante este tempo.
+LIMIAR_BLOQUEIO = 0.5
+# Intervalo entre verificações da thread da vigia.
+INTERVALO_VIGIA = 0.1
+# Bloqueios guardados (com a pilha) para o !perf.
+MAX_BLOQUEIOS = 20
+
+_lock = threading.Lock()
+_histogramas = {}
+
+
+class Histograma:
+    """Contagem por balde, soma, máximo e erros de uma operação."""
+
+    def __init__(self):
+        self.baldes = [0] * (len(BALDES) + 1)
+        self.contagem = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+        self.erros = 0
+
+    def observar(self, segundos, erro=False):
+        self.baldes[bisect_left(BALDES, segundos)] += 1
+        self.contagem += 1
+        self.soma += segundos
+        self.maximo = max(self.maximo, segundos)
+        if erro:
+            self.erros += 1
+
+    @property
+    def media(self):
+        return self.soma / self.contagem if self.contagem else 0.0
+
+    def percentil(self, p):
+        """Estimativa do percentil p (0-1), por interpolação dentro do balde."""
+        if not self.contagem:
+            return 0.0
+        alvo = p * self.contagem
+        acumulado = 0
+        for i, n in enumerate(self.baldes):
+            if n and acumulado + n >= alvo:
+                inferior = BALDES[i - 1] if i else 0.0
+                superior = BALDES[i] if i < len(BALDES) else self.maximo
+                return min(inferior + (superior - inferior) * (alvo - acumulado) / n, self.maximo)
+            acumulado += n
+        return self.maximo
+
+
+def observar(categoria, nome, segundos, erro=False):
+    """Regista a duração de uma operação (ex.: categoria 'comando', nome 'dif')."""
+    with _lock:
+        histograma = _histogramas.get((categoria, nome))
+        if histograma is None:
+            histograma = _histogramas[(categoria, nome)] = Histograma()
+        histograma.observar(segundos, erro)
+
+
+@contextmanager
+def span(categoria, nome):
+    """Mede um bloco de código; uma exceção conta como erro e é relançada."""
+    inicio = time.perf_counter()
+    erro = False
+    try:
+        yield
+    except Exception:
+        erro = True
+        raise
+    finally:
+        observar(categoria, nome, time.perf_counter() - inicio, erro)
+
+
+def cronometrado(categoria, nome=None):
+    """Decorador de corrotinas (ex.: o corpo de uma tasks.loop) que mede cada chamada."""
+    def decorador(func):
+        @functools.wraps(func)
+        async def envolvida(*args, **kwargs):
+            with span(categoria, nome or func.__name__):
+                return await func(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def instrumentar_comandos(bot):
+    """Mede todos os comandos do bot com os hooks globais before/after_invoke."""
+    async def antes(ctx):
+        ctx.inicio_perf = time.perf_counter()
+
+    async def depois(ctx):
+        inicio = getattr(ctx, "inicio_perf", None)
+        if inicio is not None and ctx.command is not None:
+            observar("comando", ctx.command.qualified_name, time.perf_counter() - inicio, ctx.command_failed)
+
+    bot.before_invoke(antes)
+    bot.after_invoke(depois)
+
+
+def estatisticas():
+    """Lista de (categoria, nome, cópia do histograma), pelo tempo total gasto."""
+    with _lock:
+        copias = []
+        for (categoria, nome), h in _histogramas.items():
+            copia = Histograma()
+            copia.baldes, copia.contagem, copia.soma = list(h.baldes), h.contagem, h.soma
+            copia.maximo, copia.erros = h.maximo, h.erros
+            copias.append((categoria, nome, copia))
+    return sorted(copias, key=lambda c: c[2].soma, reverse=True)
+
+
+def limpar():
+    with _lock:
+        _histogramas.clear()
+    vigia.bloqueios.clear()
+
+
+def relatorio():
+    """Linhas de texto com as estatísticas, para o !perf."""
+    linhas = [f"{'operação':<34} {'n':>6} {'média':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8} {'erros':>5}"]
+    for categoria, nome, h in estatisticas():
+        tempos = (h.media, h.percentil(0.5), h.percentil(0.95), h.percentil(0.99), h.maximo)
+        linhas.append(f"{f'{categoria}:{nome}'[:34]:<34} {h.contagem:>6} "
+                      + " ".join(f"{t * 1000:>6.0f}ms" for t in tempos) + f" {h.erros:>5}")
+    return linhas
+
+
+def metricas():
+    """Histogramas no formato de texto do Prometheus (acrescentado ao /metrics)."""
+    linhas = [
+        "# HELP blackforce_duration_seconds Duração dos comandos, tarefas e operações de I/O.",
+        "# TYPE blackforce_duration_seconds histogram",
+    ]
+    for categoria, nome, h in estatisticas():
+        etiquetas = f'kind="{categoria}",name="{nome}"'
+        acumulado = 0
+        for limite, n in zip(BALDES, h.baldes):
+            acumulado += n
+            linhas.append(f'blackforce_duration_seconds_bucket{{{etiquetas},le="{limite!r}"}} {acumulado}')
+        linhas.append(f'blackforce_duration_seconds_bucket{{{etiquetas},le="+Inf"}} {h.contagem}')
+        linhas.append(f"blackforce_duration_seconds_sum{{{etiquetas}}} {h.soma!r}")
+        linhas.append(f"blackforce_duration_seconds_count{{{etiquetas}}} {h.contagem}")
+    linhas.append("# HELP blackforce_errors_total Execuções terminadas com erro.")
+    linhas.append("# TYPE blackforce_errors_total counter")
+    for categoria, nome, h in estatisticas():
+        linhas.append(f'blackforce_errors_total{{kind="{categoria}",name="{nome}"}} {h.erros}')
+    linhas.append("# HELP blackforce_event_loop_blocks_total Bloqueios do event loop detetados.")
+    linhas.append("# TYPE blackforce_event_loop_blocks_total counter")
+    linhas.append(f"blackforce_event_loop_blocks_total {vigia.total}")
+    return "\n".join(linhas) + "\n"
+
+
+class VigiaLoop:
+    """
+    Deteta bloqueios do event loop. Não tem batimento próprio: uma thread à
+    parte lê o batimento do MonitorLoop de saude.py e, se o loop não acordar
+    durante mais de LIMIAR_BLOQUEIO, lê a pilha da thread do loop nesse
+    momento (o código que o está a bloquear) e mostra-a na consola.
+    """
+
+    def __init__(self, limiar=LIMIAR_BLOQUEIO, intervalo=INTERVALO_VIGIA):
+        self.limiar = limiar
+        self.intervalo = intervalo
+        self.bloqueios = deque(maxlen=MAX_BLOQUEIOS)
+        self.total = 0
+        self._monitor = None
+        self._id_thread_loop = None
+        self._atual = None
+        self._thread = None
+        self._parar = threading.Event()
+
+    def iniciar(self, monitor):
+        """
+        Arranca a vigia sobre o batimento de `monitor` (um saude.MonitorLoop).
+        Chamar de dentro do event loop, uma única vez.
+        """
+        if self._thread is not None:
+            return
+        self._monitor = monitor
+        self._id_thread_loop = threading.get_ident()
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._vigiar, name="vigia-loop", daemon=True)
+        self._thread.start()
+
+    def _vigiar(self):
+        while not self._parar.wait(self.intervalo):
+            batimento = self._monitor.batimento
+            if batimento is None:
+                # O monitor ainda não arrancou (ou já parou).
+                continue
+            parado = time.monotonic() - batimento - self._monitor.intervalo
+            if parado > self.limiar:
+                if self._atual is None:
+                    self._detetar(parado)
+                else:
+                    self._atual["duracao"] = parado
+            elif self._atual is not None:
+                self._terminar()
+
+    def _detetar(self, parado):
+        quadro = sys._current_frames().get(self._id_thread_loop)
+        pilha = "".join(traceback.format_stack(quadro)) if quadro is not None else "(pilha indisponível)\n"
+        self._atual = {"inicio": time.time() - parado, "duracao": parado, "pilha": pilha}
+        self.total += 1
+        print(f"⚠️ Event loop bloqueado há {parado:.2f} s. Pilha da thread do loop:\n{pilha}", end="")
+
+    def _terminar(self):
+        bloqueio, self._atual = self._atual, None
+        self.bloqueios.append(bloqueio)
+        observar("loop", "bloqueio", bloqueio["duracao"])
+        print(f"ℹ️ Event loop desbloqueado ao fim de ~{bloqueio['duracao']:.2f} s.")
+
+    def parar(self):
+        self._parar.set()
+        self._thread = None
+
+
+vigia = VigiaLoop()
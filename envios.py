@@ -0,0 +1,190 @@
+"""
+Agendador central das mensagens enviadas pelo bot.
+
+Cada canal tem uma fila por prioridade, despachada por uma única tarefa, que
+respeita os limites do Discord (por canal e global) antes de cada envio. Os
+alertas (ex.: bosses) passam à frente dos relatórios em espera. Mensagens só
+com embeds para o mesmo canal que estejam na fila ao mesmo tempo são juntadas
+numa só mensagem (até 10 embeds), por isso uma rajada de alertas ou de
+dungeons sai em poucos pedidos.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+
+import desempenho
+
+# Prioridades (menor sai primeiro).
+ALTA = 0
+NORMAL = 1
+BAIXA = 2
+
+# Limite do Discord por canal: 5 mensagens a cada 5 segundos.
+MENSAGENS_POR_JANELA = 5
+JANELA_SEGUNDOS = 5.0
+# Limite global do Discord: 50 pedidos por segundo.
+PEDIDOS_GLOBAIS = 50
+JANELA_GLOBAL = 1.0
+# Limites do Discord para os embeds de uma mensagem.
+MAX_EMBEDS = 10
+MAX_CARACTERES_EMBEDS = 6000
+
+
+class JanelaDeslizante:
+    """No máximo `maximo` envios em cada `segundos` (janela deslizante)."""
+
+    def __init__(self, maximo, segundos):
+        self.maximo = maximo
+        self.segundos = segundos
+        self._envios = deque(maxlen=maximo)
+        self._lock = None
+
+    def espera(self):
+        """Segundos até poder enviar (0 se já pode)."""
+        if len(self._envios) < self.maximo:
+            return 0.0
+        return max(0.0, self._envios[0] + self.segundos - time.monotonic())
+
+    async def aguardar(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            espera = self.espera()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            self._envios.append(time.monotonic())
+
+
+class _Envio:
+    __slots__ = ("destino", "args", "kwargs", "futuro")
+
+    def __init__(self, destino, args, kwargs, futuro):
+        self.destino = destino
+        self.args = args
+        self.kwargs = kwargs
+        self.futuro = futuro
+
+    @property
+    def embeds(self):
+        """Os embeds, se a mensagem só tiver embeds (e puder ser juntada a outras); senão None."""
+        if self.args or set(self.kwargs) - {"embed", "embeds"}:
+            return None
+        embeds = list(self.kwargs.get("embeds") or [])
+        if self.kwargs.get("embed") is not None:
+            embeds.append(self.kwargs["embed"])
+        return embeds or None
+
+
+def _canal_id(destino):
+    canal = getattr(destino, "channel", destino)
+    return getattr(canal, "id", id(canal))
+
+
+class AgendadorEnvios:
+    """Filas de envio por canal, com prioridade, limites do Discord e junção de embeds."""
+
+    def __init__(self):
+        self._filas = {}
+        self._janelas = {}
+        self._global = JanelaDeslizante(PEDIDOS_GLOBAIS, JANELA_GLOBAL)
+        self._trabalhadores = {}
+        self._sequencia = itertools.count()
+        self.pedidos = 0
+        self.mensagens = 0
+
+    def agendar(self, destino, *args, prioridade=NORMAL, **kwargs):
+        """
+        Põe uma mensagem (argumentos de destino.send) na fila do canal e
+        devolve um future com a Message enviada. Mensagens agendadas de
+        seguida, sem await pelo meio, podem ser juntadas.
+        """
+        canal_id = _canal_id(destino)
+        futuro = asyncio.get_running_loop().create_future()
+        fila = self._filas.setdefault(canal_id, [])
+        heapq.heappush(fila, (prioridade, next(self._sequencia), _Envio(destino, args, kwargs, futuro)))
+        self.mensagens += 1
+        if canal_id not in self._trabalhadores:
+            self._trabalhadores[canal_id] = asyncio.create_task(self._despachar(canal_id))
+        return futuro
+
+    async def enviar(self, destino, *args, prioridade=NORMAL, **kwargs):
+        return await self.agendar(destino, *args, prioridade=prioridade, **kwargs)
+
+    def _retirar_lote(self, fila):
+        """
+        Retira a próxima mensagem da fila; se for só de embeds, junta-lhe as
+        seguintes que também o sejam, por ordem de prioridade, até aos limites
+        do Discord.
+        """
+        _, _, primeiro = heapq.heappop(fila)
+        embeds = primeiro.embeds
+        if embeds is None or not fila:
+            return [primeiro], None
+
+        lote, restantes = [primeiro], []
+        caracteres = sum(len(e) for e in embeds)
+        for entrada in sorted(fila):
+            extra = entrada[2].embeds
+            if (extra is not None and len(embeds) + len(extra) <= MAX_EMBEDS
+                    and caracteres + sum(len(e) for e in extra) <= MAX_CARACTERES_EMBEDS):
+                lote.append(entrada[2])
+                embeds = embeds + extra
+                caracteres += sum(len(e) for e in extra)
+            else:
+                restantes.append(entrada)
+        if len(lote) == 1:
+            return lote, None
+        fila[:] = restantes
+        heapq.heapify(fila)
+        return lote, embeds
+
+    async def _despachar(self, canal_id):
+        fila = self._filas[canal_id]
+        janela = self._janelas.setdefault(canal_id, JanelaDeslizante(MENSAGENS_POR_JANELA, JANELA_SEGUNDOS))
+        try:
+            while fila:
+                # A mensagem só é escolhida depois da espera: entretanto podem ter
+                # chegado alertas mais urgentes ou embeds para juntar.
+                await janela.aguardar()
+                await self._global.aguardar()
+                lote, embeds = self._retirar_lote(fila)
+                lote = [envio for envio in lote if not envio.futuro.cancelled()]
+                if not lote:
+                    continue
+                primeiro = lote[0]
+                kwargs = primeiro.kwargs if embeds is None else {"embeds": embeds}
+                self.pedidos += 1
+                try:
+                    with desempenho.span("http", "discord envio"):
+                        mensagem = await primeiro.destino.send(*primeiro.args, **kwargs)
+                except Exception as e:
+                    for envio in lote:
+                        if not envio.futuro.done():
+                            envio.futuro.set_exception(e)
+                else:
+                    for envio in lote:
+                        if not envio.futuro.done():
+                            envio.futuro.set_result(mensagem)
+        finally:
+            del self._trabalhadores[canal_id]
+            if not fila:
+                self._filas.pop(canal_id, None)
+
+
+agendador = AgendadorEnvios()
+
+
+async def enviar(destino, *args, prioridade=NORMAL, **kwargs):
+    """ctx.send/canal.send através do agendador (limites do Discord e prioridade)."""
+    return await agendador.enviar(destino, *args, prioridade=prioridade, **kwargs)
+
+
+async def enviar_embeds(destino, embeds, prioridade=NORMAL):
+    """
+    Envia vários embeds de uma vez, juntados em tão poucas mensagens quanto
+    possível. Devolve, por embed, a Message enviada ou a exceção.
+    """
+    futuros = [agendador.agendar(destino, embed=embed, prioridade=prioridade) for embed in embeds]
+    return await asyncio.gather(*futuros, return_exceptions=True)
@@ -0,0 +1,31 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads para leituras e construção de relatórios (pandas liberta o GIL na
+# maior parte das operações vetorizadas, por isso não compensa um process pool
+# que teria de serializar o DataFrame inteiro para cada pedido).
+MAX_LEITURAS = 4
+
+_leituras = ThreadPoolExecutor(max_workers=MAX_LEITURAS, thread_name_prefix="dados-leitura")
+# Uma única thread de escrita: as alterações são aplicadas pela ordem de chegada
+# e um ler-modificar-gravar nunca se cruza com outro.
+_escritas = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dados-escrita")
+
+
+async def executar(func, *args, **kwargs):
+    """Corre trabalho de leitura/cálculo fora do event loop (no máximo MAX_LEITURAS em paralelo)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_leituras, functools.partial(func, *args, **kwargs))
+
+
+async def executar_escrita(func, *args, **kwargs):
+    """Corre uma alteração aos dados fora do event loop, serializada com as restantes escritas."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_escritas, functools.partial(func, *args, **kwargs))
+
+
+def fechar():
+    """Espera pelas escritas pendentes e encerra as threads."""
+    _escritas.shutdown(wait=True)
+    _leituras.shutdown(wait=True)
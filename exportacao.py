@@ -0,0 +1,57 @@
+import io
+
+import pandas as pd
+from openpyxl import Workbook
+
+try:
+    import pyarrow  # noqa: F401 (motor do DataFrame.to_parquet)
+except ImportError:  # sem pyarrow só há xlsx e csv
+    pyarrow = None
+
+# Número de linhas convertidas de cada vez para o writer do xlsx.
+LINHAS_POR_BLOCO = 10_000
+
+
+def _valores(serie):
+    """Valores Python de uma coluna, com datas sem hora e None nos valores em falta."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        serie = serie.dt.date
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+def _xlsx(df, destino):
+    # Workbook write_only: as linhas vão diretamente para o zip, a memória do
+    # writer não cresce com o número de linhas.
+    livro = Workbook(write_only=True)
+    folha = livro.create_sheet("Sheet1")
+    folha.append(list(df.columns))
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+        bloco = df.iloc[inicio:inicio + LINHAS_POR_BLOCO]
+        for linha in zip(*(_valores(bloco[c]) for c in df.columns)):
+            folha.append(linha)
+    livro.save(destino)
+
+
+def _csv(df, destino):
+    df.to_csv(destino, index=False, date_format="%Y-%m-%d", encoding="utf-8")
+
+
+def _parquet(df, destino):
+    df.to_parquet(destino, index=False)
+
+
+FORMATOS = {"xlsx": _xlsx, "csv": _csv}
+if pyarrow is not None:
+    FORMATOS["parquet"] = _parquet
+
+
+def exportar(df, formato="xlsx"):
+    """
+    Escreve o DataFrame no formato pedido para um buffer em memória e devolve-o
+    pronto a enviar (discord.File aceita o buffer diretamente).
+    Chamada bloqueante: usar fora do event loop.
+    """
+    buffer = io.BytesIO()
+    FORMATOS[formato](df, buffer)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,123 @@
+import io
+import re
+
+import pandas as pd
+
+COLUNAS_LOTE = ["data", "nome", "score", "contribuicao", "dano_boss"]
+VALORES = ["score", "contribuicao", "dano_boss"]
+
+FORMATO_INVALIDO = "Formato de registro inválido. Use: `[data] nome score contribuicao [dano_boss]`."
+
+# Registos colados no comando: separados por ';' ou por mudança de linha.
+_SEPARADOR_REGISTOS = re.compile(r"[;\r\n]+")
+_INTEIRO = r"-?\d+"
+_PARECE_DATA = r"\d{4}[/-]\d{1,2}[/-]\d{1,2}"
+
+
+def _datas(serie):
+    """Converte AAAA/MM/DD (ou AAAA-MM-DD) em datetime64; o resto fica NaT."""
+    return pd.to_datetime(serie.str.replace("-", "/", regex=False), format="%Y/%m/%d", errors="coerce")
+
+
+def _validar(campos, originais, contribuicao_obrigatoria, data_invalida=None):
+    """
+    Valida todos os registos de uma vez, coluna a coluna.
+    campos tem as colunas de COLUNAS_LOTE ainda em texto (data já convertida).
+    Devolve (lote, falhas), com o motivo apenas para os registos rejeitados.
+    """
+    motivo = pd.Series(None, index=campos.index, dtype=object)
+    # Do menos para o mais grave: o último motivo atribuído prevalece.
+    for col in reversed(VALORES):
+        presente = campos[col].notna()
+        invalido = presente & ~campos[col].fillna("").str.fullmatch(_INTEIRO)
+        motivo[invalido] = "valor inválido para " + col + ": '" + campos.loc[invalido, col].astype(str) + "'"
+    if data_invalida is not None:
+        motivo[data_invalida] = "data inválida (use AAAA/MM/DD)"
+    formato = (campos["nome"].isna() | campos["score"].isna()
+               | (contribuicao_obrigatoria & campos["contribuicao"].isna()))
+    motivo[formato] = FORMATO_INVALIDO
+
+    falha = motivo.notna()
+    falhas = [f"{r}: {m}" for r, m in zip(originais[falha], motivo[falha])]
+
+    lote = campos[~falha].copy()
+    for col in VALORES:
+        lote[col] = pd.to_numeric(lote[col]).astype("Int64")
+    return lote[COLUNAS_LOTE], falhas
+
+
+def analisar_texto(texto, dia_padrao):
+    """
+    Tokeniza e valida, numa única passagem vetorizada, registos no formato
+    `[data] nome score contribuicao [dano_boss]`. Sem data, o registo fica com
+    dia_padrao (a data lógica, calculada uma vez para o lote inteiro).
+    """
+    registos = pd.Series(_SEPARADOR_REGISTOS.split(texto), dtype=object).str.strip()
+    registos = registos[registos != ""].reset_index(drop=True)
+    if registos.empty:
+        # Só separadores (ex.: `!inserir2 ; ;` ou um .txt vazio): nada a inserir.
+        return pd.DataFrame(columns=COLUNAS_LOTE), []
+    partes = registos.str.split(n=5, expand=True).reindex(columns=range(5))
+
+    primeiro = partes[0].fillna("")
+    datas = _datas(primeiro)
+    com_data = primeiro.str.fullmatch(_PARECE_DATA)
+    # Nos registos com data os campos estão uma posição à frente.
+    campos = pd.DataFrame({
+        "data": datas.where(com_data, pd.Timestamp(dia_padrao)).fillna(pd.Timestamp(dia_padrao)),
+        "nome": partes[1].where(com_data, partes[0]),
+        "score": partes[2].where(com_data, partes[1]),
+        "contribuicao": partes[3].where(com_data, partes[2]),
+        "dano_boss": partes[4].where(com_data, partes[3]),
+    })
+    return _validar(campos, registos, contribuicao_obrigatoria=~com_data,
+                    data_invalida=com_data & datas.isna())
+
+
+def analisar_csv(conteudo, dia_padrao):
+    """
+    Lê um CSV com cabeçalho (colunas nome e score obrigatórias; data,
+    contribuicao e dano_boss opcionais). O separador é detetado automaticamente.
+    """
+    df = pd.read_csv(io.BytesIO(conteudo), dtype=str, sep=None, engine="python",
+                     skipinitialspace=True, encoding="utf-8-sig")
+    df.columns = df.columns.str.strip().str.lower()
+    df = df.apply(lambda col: col.str.strip()).replace("", None)
+    originais = df.fillna("").astype(str).agg(",".join, axis=1)
+
+    campos = df.reindex(columns=COLUNAS_LOTE).astype(object)
+    datas = _datas(campos["data"].fillna(""))
+    data_invalida = campos["data"].notna() & datas.isna()
+    campos["data"] = datas.fillna(pd.Timestamp(dia_padrao))
+    return _validar(campos, originais, contribuicao_obrigatoria=False, data_invalida=data_invalida)
+
+
+def analisar_ficheiro(conteudo, dia_padrao):
+    """Ficheiro anexado: CSV se a primeira linha for um cabeçalho com 'nome', senão texto livre."""
+    primeira_linha = conteudo.split(b"\n", 1)[0].decode("utf-8-sig", errors="replace").lower()
+    if "nome" in primeira_linha:
+        return analisar_csv(conteudo, dia_padrao)
+    return analisar_texto(conteudo.decode("utf-8-sig", errors="replace"), dia_padrao)
+
+
+def analisar(dia_padrao, texto="", ficheiros=()):
+    """
+    Junta num único lote os registos do texto do comando e dos ficheiros
+    anexados. Devolve (lote, falhas); o lote vai inteiro para um upsert.
+    """
+    lotes, falhas = [], []
+    if texto and texto.strip():
+        lote, f = analisar_texto(texto, dia_padrao)
+        lotes.append(lote)
+        falhas += f
+    for conteudo in ficheiros:
+        try:
+            lote, f = analisar_ficheiro(conteudo, dia_padrao)
+        except (ValueError, pd.errors.ParserError) as e:
+            falhas.append(f"Ficheiro ilegível: {e}")
+            continue
+        lotes.append(lote)
+        falhas += f
+    lotes = [l for l in lotes if not l.empty]
+    lote = pd.concat(lotes, ignore_index=True) if lotes else pd.DataFrame(columns=COLUNAS_LOTE)
+    return lote, falhas
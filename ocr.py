@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import re
+from collections import OrderedDict
+
+import aiohttp
+
+import desempenho
+
+# Pedidos em simultâneo ao serviço de OCR (o plano gratuito do ocr.space limita a concorrência).
+MAX_PEDIDOS = 4
+# Resultados guardados por hash da imagem: reenviar a mesma captura não gera novo pedido.
+TAMANHO_CACHE = 256
+TEMPO_LIMITE = 60
+
+_NUMERO = re.compile(r"\d{1,3}(?:[.,]\d{3})+|\d+")
+_PONTUACAO = "|:;()[]"
+
+
+class ErroOCR(Exception):
+    pass
+
+
+class ClienteOCR:
+    """
+    Cliente assíncrono do OCR (API do ocr.space ou compatível).
+
+    Usa uma única sessão aiohttp (ligações reutilizadas), limita os pedidos em
+    simultâneo e guarda o texto reconhecido por hash SHA-256 da imagem. Pedidos
+    simultâneos da mesma imagem partilham o mesmo pedido HTTP.
+    """
+
+    def __init__(self, url, chave, max_pedidos=MAX_PEDIDOS, tamanho_cache=TAMANHO_CACHE):
+        self.url = url
+        self.chave = chave
+        self.tamanho_cache = tamanho_cache
+        self._max_pedidos = max_pedidos
+        self._sessao = None
+        self._semaforo = None
+        self._cache = OrderedDict()
+        self._em_curso = {}
+
+    @property
+    def disponivel(self):
+        return bool(self.url and self.chave)
+
+    def _obter_sessao(self):
+        if self._sessao is None or self._sessao.closed:
+            self._sessao = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._max_pedidos),
+                timeout=aiohttp.ClientTimeout(total=TEMPO_LIMITE),
+            )
+            self._semaforo = asyncio.Semaphore(self._max_pedidos)
+        return self._sessao
+
+    async def reconhecer(self, imagem, nome_ficheiro="imagem.png"):
+        """Devolve o texto reconhecido numa imagem (bytes)."""
+        chave = hashlib.sha256(imagem).hexdigest()
+        if chave in self._cache:
+            self._cache.move_to_end(chave)
+            return self._cache[chave]
+
+        pedido = self._em_curso.get(chave)
+        if pedido is None:
+            pedido = self._em_curso[chave] = asyncio.ensure_future(self._pedir(imagem, nome_ficheiro))
+            pedido.add_done_callback(lambda _: self._em_curso.pop(chave, None))
+        texto = await asyncio.shield(pedido)
+
+        self._cache[chave] = texto
+        while len(self._cache) > self.tamanho_cache:
+            self._cache.popitem(last=False)
+        return texto
+
+    async def _pedir(self, imagem, nome_ficheiro):
+        sessao = self._obter_sessao()
+        formulario = aiohttp.FormData()
+        formulario.add_field("apikey", self.chave)
+        formulario.add_field("isTable", "true")
+        formulario.add_field("OCREngine", "2")
+        formulario.add_field("scale", "true")
+        formulario.add_field("file", imagem, filename=nome_ficheiro)
+
+        async with self._semaforo:
+            with desempenho.span("http", "ocr"):
+                async with sessao.post(self.url, data=formulario) as resposta:
+                    if resposta.status != 200:
+                        raise ErroOCR(f"o serviço de OCR respondeu {resposta.status}")
+                    dados = await resposta.json(content_type=None)
+
+        if dados.get("IsErroredOnProcessing"):
+            erro = dados.get("ErrorMessage") or "erro desconhecido"
+            raise ErroOCR(erro if isinstance(erro, str) else "; ".join(erro))
+        return "\n".join(r.get("ParsedText", "") for r in dados.get("ParsedResults") or [])
+
+    async def fechar(self):
+        if self._sessao is not None and not self._sessao.closed:
+            await self._sessao.close()
+
+
+def extrair_registos(texto):
+    """
+    Converte o texto de uma captura do roster em linhas `nome score contribuicao`
+    (o formato do !inserir2). Em cada linha, o nome é o primeiro texto não
+    numérico e score/contribuição são os dois números seguintes; números antes
+    do nome (posição no ranking) e linhas sem dois números são ignorados.
+    """
+    registos = []
+    for linha in texto.splitlines():
+        nome, numeros = None, []
+        for token in linha.split():
+            token = token.strip(_PONTUACAO)
+            if not token:
+                continue
+            if _NUMERO.fullmatch(token):
+                if nome is not None:
+                    numeros.append(re.sub(r"\D", "", token))
+            elif nome is None:
+                nome = token
+        if nome is not None and len(numeros) >= 2:
+            registos.append(f"{nome} {numeros[0]} {numeros[1]}")
+    return registos
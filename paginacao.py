@@ -0,0 +1,139 @@
+import asyncio
+import io
+import time
+from itertools import islice
+
+import discord
+
+from envios import NORMAL, agendador, enviar
+
+# Tamanho máximo do texto de cada mensagem (o Discord aceita 2000, com margem para o ```).
+LIMITE_CARACTERES = 1900
+# A partir deste número de mensagens o relatório é enviado como um único ficheiro.
+MAX_MENSAGENS = 8
+# Tamanho máximo de uma mensagem do Discord.
+LIMITE_MENSAGEM = 2000
+# Intervalo mínimo entre edições de uma mensagem que está a ser escrita aos bocados.
+INTERVALO_EDICAO = 1.0
+
+
+def gerar_paginas(linhas, cabecalho="", rodape="", limite=LIMITE_CARACTERES):
+    """
+    Gera as páginas de texto a partir de um iterador de linhas, sem construir
+    strings por concatenação repetida. O cabeçalho é repetido em cada página e
+    o rodapé é acrescentado à última.
+    """
+    espaco = limite - len(cabecalho)
+    partes, tamanho = [], 0
+    for linha in linhas:
+        # Linhas maiores do que uma página são cortadas.
+        while len(linha) > espaco:
+            if partes:
+                yield cabecalho + "\n".join(partes)
+                partes, tamanho = [], 0
+            yield cabecalho + linha[:espaco]
+            linha = linha[espaco:]
+        if partes and tamanho + len(linha) + 1 > espaco:
+            yield cabecalho + "\n".join(partes)
+            partes, tamanho = [], 0
+        partes.append(linha)
+        tamanho += len(linha) + 1
+
+    ultima = cabecalho + "\n".join(partes)
+    if len(ultima) + len(rodape) > limite:
+        yield ultima
+        ultima = rodape.strip()
+    else:
+        ultima = ultima.strip() + rodape
+    if ultima.strip():
+        yield ultima
+
+
+async def enviar_paginas(destino, linhas, cabecalho="", rodape="", bloco="```",
+                         nome_ficheiro="relatorio.txt", max_mensagens=MAX_MENSAGENS, prioridade=NORMAL):
+    """
+    Envia um relatório paginado a partir de um iterador de linhas.
+    Só são geradas as páginas necessárias para decidir o formato: se o relatório
+    precisar de mais de max_mensagens mensagens, é enviado como um único
+    ficheiro de texto em vez de uma rajada de mensagens.
+    """
+    linhas = iter(linhas)
+    consumidas = []
+
+    def registar():
+        for linha in linhas:
+            consumidas.append(linha)
+            yield linha
+
+    margem = 2 * len(bloco)
+    paginas = gerar_paginas(registar(), cabecalho, rodape, LIMITE_CARACTERES - margem)
+    primeiras = list(islice(paginas, max_mensagens + 1))
+
+    if len(primeiras) > max_mensagens:
+        consumidas.extend(linhas)
+        conteudo = io.StringIO()
+        conteudo.write(cabecalho)
+        conteudo.writelines(linha + "\n" for linha in consumidas)
+        conteudo.write(rodape.strip() + "\n")
+        ficheiro = discord.File(io.BytesIO(conteudo.getvalue().encode("utf-8")), filename=nome_ficheiro)
+        await enviar(destino, f"📄 Relatório com {len(consumidas)} linhas (em anexo).", file=ficheiro,
+                     prioridade=prioridade)
+        return
+
+    # Todas as páginas entram na fila de uma vez; o agendador envia-as pela ordem.
+    await asyncio.gather(*(
+        agendador.agendar(destino, f"{bloco}{pagina}{bloco}", prioridade=prioridade) for pagina in primeiras
+    ))
+
+
+def _ponto_de_corte(texto, limite):
+    """Posição onde cortar texto com mais de limite caracteres: de preferência numa linha ou espaço."""
+    for separador in ("\n", " "):
+        corte = texto.rfind(separador, limite // 2, limite)
+        if corte > 0:
+            return corte
+    return limite
+
+
+async def enviar_progressivo(destino, pedacos, limite=LIMITE_MENSAGEM, intervalo=INTERVALO_EDICAO):
+    """
+    Envia um texto que chega aos bocados (iterador assíncrono de strings).
+    A primeira parte é enviada assim que chega; a mensagem vai sendo editada
+    no máximo a cada intervalo segundos e, quando passa o limite do Discord,
+    o texto continua numa nova mensagem. O corte é feito numa mudança de linha
+    ou espaço e os blocos ``` abertos são fechados e reabertos na mensagem
+    seguinte. Devolve o texto completo.
+    """
+    # Reserva para fechar um bloco de código no fim de cada mensagem.
+    limite -= 4
+    completo, atual = [], ""
+    mensagem, mostrado, ultima = None, "", 0.0
+
+    async def mostrar(texto):
+        nonlocal mensagem, mostrado, ultima
+        if not texto.strip() or texto == mostrado:
+            return
+        if mensagem is None:
+            mensagem = await enviar(destino, texto)
+        else:
+            await mensagem.edit(content=texto)
+        mostrado, ultima = texto, time.monotonic()
+
+    async for pedaco in pedacos:
+        if not pedaco:
+            continue
+        completo.append(pedaco)
+        atual += pedaco
+        while len(atual) > limite:
+            corte = _ponto_de_corte(atual, limite)
+            parte, atual = atual[:corte], atual[corte:].lstrip("\n")
+            if parte.count("```") % 2:
+                parte += "\n```"
+                atual = "```\n" + atual
+            await mostrar(parte)
+            mensagem, mostrado = None, ""
+        if time.monotonic() - ultima >= intervalo:
+            await mostrar(atual)
+
+    await mostrar(atual)
+    return "".join(completo)
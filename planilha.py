@@ -0,0 +1,189 @@
+import asyncio
+import threading
+
+import desempenho
+
+# Tempo (segundos) durante o qual as escritas são acumuladas antes de um único batch_update.
+ATRASO_ENVIO = 2
+# Depois de uma falha, a espera até à nova tentativa duplica até este máximo (segundos).
+ATRASO_MAXIMO_REPETICAO = 300
+
+
+def _converter(valor):
+    return int(valor) if str(valor).isdigit() else valor
+
+
+class ConfiguracoesSheets:
+    """
+    Acesso à folha 'ConfiguracoesIDs' do Google Sheets com cache local.
+
+    A folha é aberta e lida uma única vez; as leituras seguintes vêm do dicionário
+    em memória. As escritas atualizam a cache de imediato e são enviadas em
+    segundo plano, agrupadas num único batch_update.
+    """
+
+    def __init__(self, gc, chave_planilha, nome_folha='ConfiguracoesIDs'):
+        self.gc = gc
+        self.chave_planilha = chave_planilha
+        self.nome_folha = nome_folha
+        self._folha = None
+        self._valores = {}
+        self._linhas = {}
+        self._col_chave = 1
+        self._col_valor = 2
+        self._ultima_linha = 1
+        self._pendentes = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._envio = None
+        self._carregamento = None
+
+    @property
+    def disponivel(self):
+        return self.gc is not None
+
+    # --- CARREGAMENTO ---
+    def _carregar(self):
+        """Abre a folha e lê todas as chaves (chamada bloqueante, feita uma única vez)."""
+        with desempenho.span("sheets", "carregar folha"):
+            folha = self.gc.open_by_key(self.chave_planilha).worksheet(self.nome_folha)
+            linhas = folha.get_all_values()
+
+        cabecalho = linhas[0] if linhas else ['Chave', 'Valor']
+        col_chave = cabecalho.index('Chave') + 1 if 'Chave' in cabecalho else 1
+        col_valor = cabecalho.index('Valor') + 1 if 'Valor' in cabecalho else col_chave + 1
+
+        valores, posicoes = {}, {}
+        for numero, linha in enumerate(linhas[1:], start=2):
+            chave = linha[col_chave - 1] if len(linha) >= col_chave else ''
+            if not chave:
+                continue
+            valores[chave] = _converter(linha[col_valor - 1] if len(linha) >= col_valor else '')
+            posicoes[chave] = numero
+
+        with self._lock:
+            self._folha = folha
+            self._col_chave, self._col_valor = col_chave, col_valor
+            self._ultima_linha = max(len(linhas), 1)
+            # Escritas feitas antes do carregamento prevalecem sobre a folha.
+            valores.update(self._valores)
+            self._valores = valores
+            self._linhas = posicoes
+
+    async def carregar(self):
+        """Carrega a folha fora do event loop (usado no arranque do bot)."""
+        if not self.disponivel or self._folha is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        await self._recarregar()
+
+    # --- LEITURA / ESCRITA ---
+    def ler(self):
+        """
+        Devolve as chaves em cache, sem nunca fazer chamadas de rede. Se o
+        carregamento do arranque falhou, devolve a cache (talvez vazia) e
+        agenda uma nova tentativa fora do event loop.
+        """
+        if self._folha is None and self.disponivel:
+            self._agendar_carregamento()
+        with self._lock:
+            return dict(self._valores)
+
+    def escrever(self, chave, valor):
+        """Atualiza a cache e agenda o envio para o Sheets."""
+        with self._lock:
+            self._valores[chave] = _converter(valor)
+            self._pendentes[chave] = str(valor)
+        self._agendar_envio()
+
+    def _agendar_carregamento(self):
+        loop = self._loop
+        if loop is None:
+            try:
+                loop = self._loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Sem event loop: o carregamento fica para o carregar() do arranque.
+                return
+        loop.call_soon_threadsafe(self._criar_carregamento)
+
+    def _criar_carregamento(self):
+        # Uma única tentativa de cada vez, por mais leituras que cheguem entretanto.
+        if self._folha is None and (self._carregamento is None or self._carregamento.done()):
+            self._carregamento = asyncio.ensure_future(self._recarregar())
+
+    async def _recarregar(self):
+        try:
+            await asyncio.to_thread(self._carregar)
+            print(f"✅ Folha '{self.nome_folha}' carregada para cache ({len(self._valores)} chaves).")
+        except Exception as e:
+            print(f"❌ Falha ao aceder à folha '{self.nome_folha}' para persistência: {e}")
+
+    def _agendar_envio(self):
+        loop = self._loop
+        if loop is None:
+            try:
+                loop = self._loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Sem event loop (ex.: chamado antes do bot arrancar): envia já.
+                self.enviar_pendentes()
+                return
+        loop.call_soon_threadsafe(self._criar_envio)
+
+    def _criar_envio(self):
+        if self._envio is None or self._envio.done():
+            self._envio = asyncio.ensure_future(self._enviar_com_atraso())
+
+    async def _enviar_com_atraso(self):
+        # Continua enquanto houver escritas pendentes: novas, chegadas durante o
+        # envio anterior, ou repostas depois de uma falha (com espera crescente).
+        atraso = ATRASO_ENVIO
+        while self._pendentes:
+            await asyncio.sleep(atraso)
+            try:
+                await asyncio.to_thread(self.enviar_pendentes)
+                atraso = ATRASO_ENVIO
+            except Exception as e:
+                atraso = min(atraso * 2, ATRASO_MAXIMO_REPETICAO)
+                print(f"❌ Falha ao escrever na folha '{self.nome_folha}' (nova tentativa daqui a {atraso} s): {e}")
+
+    def enviar_pendentes(self):
+        """Envia todas as escritas pendentes num único batch_update."""
+        from gspread.utils import rowcol_to_a1
+
+        if self._folha is None:
+            self._carregar()
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, {}
+            atualizacoes, novas = [], []
+            ultima_linha = self._ultima_linha
+            for chave, valor in pendentes.items():
+                linha = self._linhas.get(chave)
+                if linha is None:
+                    self._ultima_linha += 1
+                    linha = self._linhas[chave] = self._ultima_linha
+                    novas.append(chave)
+                    atualizacoes.append({'range': rowcol_to_a1(linha, self._col_chave), 'values': [[chave]]})
+                atualizacoes.append({'range': rowcol_to_a1(linha, self._col_valor), 'values': [[valor]]})
+
+        if not atualizacoes:
+            return
+        try:
+            with desempenho.span("sheets", "batch_update"):
+                self._folha.batch_update(atualizacoes, value_input_option='USER_ENTERED')
+        except Exception:
+            # Repõe as escritas para a próxima tentativa, sem sobrepor valores mais recentes.
+            with self._lock:
+                for chave in novas:
+                    self._linhas.pop(chave, None)
+                # Devolve as linhas reservadas, se entretanto não tiverem sido reservadas
+                # outras a seguir (senão ficariam linhas em branco na folha).
+                if self._ultima_linha == ultima_linha + len(novas):
+                    self._ultima_linha = ultima_linha
+                for chave, valor in pendentes.items():
+                    self._pendentes.setdefault(chave, valor)
+            raise
+
+    def fechar(self):
+        """Envia o que estiver pendente (chamado ao desligar o bot)."""
+        if self._pendentes:
+            self.enviar_pendentes()
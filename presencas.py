@@ -0,0 +1,169 @@
+import os
+from bisect import bisect_left, bisect_right, insort
+from typing import NamedTuple
+
+import pandas as pd
+
+# Meta diária de attendance: o jogador cumpre se, em relação ao dia anterior,
+# subir pelo menos SCORE_MINIMO de score e CONTRIBUICAO_MINIMA de contribuição.
+SCORE_MINIMO = int(os.getenv("ATTENDANCE_SCORE_MINIMO", 2))
+CONTRIBUICAO_MINIMA = int(os.getenv("ATTENDANCE_CONTRIBUICAO_MINIMA", 1050))
+
+VALORES = ["score", "contribuicao"]
+COLUNAS_RESULTADO = [
+    "nome", "score_inicial", "score_final", "contribuicao_inicial",
+    "contribuicao_final", "tem_inicial", "cumpriu",
+]
+
+
+def _dia(valor):
+    """Chave de dia (datetime.date) a partir de um date ou de um Timestamp da coluna datetime64."""
+    return pd.Timestamp(valor).date()
+
+
+def _fatia(df):
+    """Valores de um dia: índice 'nome', colunas score/contribuicao em int64 (em falta = 0)."""
+    fatia = df.drop_duplicates("nome", keep="last").set_index("nome")[VALORES]
+    # Índice simples de strings: as fatias de dias diferentes podem ter categorias diferentes.
+    fatia.index = fatia.index.astype(object)
+    return fatia.apply(lambda col: pd.to_numeric(col, errors="coerce")).fillna(0).astype("int64")
+
+
+class ResultadoPresencas(NamedTuple):
+    """Resultado compacto da comparação entre dois dias, usado por todos os relatórios."""
+    data_inicial: object
+    data_final: object
+    tabela: pd.DataFrame
+
+    @property
+    def cumpriram(self):
+        return int(self.tabela["cumpriu"].sum())
+
+    @property
+    def nao_cumpriram(self):
+        return len(self.tabela) - self.cumpriram
+
+    def filtrar(self, apenas_nao_cumpriram=False, apenas_com_inicial=False):
+        mascara = pd.Series(True, index=self.tabela.index)
+        if apenas_nao_cumpriram:
+            mascara &= ~self.tabela["cumpriu"]
+        if apenas_com_inicial:
+            mascara &= self.tabela["tem_inicial"]
+        return self._replace(tabela=self.tabela[mascara])
+
+    @property
+    def vazio(self):
+        return self.tabela.empty
+
+
+def comparar_fatias(inicial, final, data_inicial=None, data_final=None):
+    """
+    Motor de comparação vetorizado: um único join das duas fatias por 'nome',
+    com as diferenças e a meta calculadas coluna a coluna.
+    Membros sem registo no dia inicial contam com score/contribuição 0.
+    """
+    t = final.join(inicial, how="left", rsuffix="_inicial")
+    tem_inicial = t["score_inicial"].notna()
+    score_i = t["score_inicial"].fillna(0).astype("int64")
+    contrib_i = t["contribuicao_inicial"].fillna(0).astype("int64")
+    cumpriu = ((t["score"] - score_i >= SCORE_MINIMO)
+               & (t["contribuicao"] - contrib_i >= CONTRIBUICAO_MINIMA))
+    tabela = pd.DataFrame({
+        "nome": t.index,
+        "score_inicial": score_i.to_numpy(),
+        "score_final": t["score"].to_numpy(),
+        "contribuicao_inicial": contrib_i.to_numpy(),
+        "contribuicao_final": t["contribuicao"].to_numpy(),
+        "tem_inicial": tem_inicial.to_numpy(),
+        "cumpriu": cumpriu.to_numpy(),
+    }, columns=COLUNAS_RESULTADO)
+    return ResultadoPresencas(data_inicial, data_final, tabela)
+
+
+_VAZIA = pd.DataFrame({c: pd.Series(dtype="int64") for c in VALORES}, index=pd.Index([], name="nome"))
+
+
+class Presencas:
+    """
+    Attendance diária materializada de forma incremental.
+
+    Guarda os valores de cada dia (uma fatia por dia) e, para cada dia, o
+    resultado da comparação com o dia anterior registado. Uma escrita só
+    invalida o dia alterado e o dia seguinte; esses dias são recalculados pelo
+    motor vetorizado na próxima consulta, por isso os relatórios dos dois
+    últimos dias custam O(membros) e não O(histórico).
+    Não é thread-safe: a BaseDados chama-a sempre com o seu lock.
+    """
+
+    def __init__(self):
+        self._dias = []
+        self._fatias = {}
+        self._estado = {}
+
+    def reconstruir(self, df):
+        self._fatias = {_dia(dia): _fatia(g) for dia, g in df.groupby("data", sort=False)}
+        self._dias = sorted(self._fatias)
+        self._estado = dict.fromkeys(self._dias)
+
+    def _anterior(self, dia):
+        i = bisect_left(self._dias, dia)
+        return self._dias[i - 1] if i > 0 else None
+
+    def _seguinte(self, dia):
+        i = bisect_right(self._dias, dia)
+        return self._dias[i] if i < len(self._dias) else None
+
+    def _invalidar(self, dia):
+        self._estado[dia] = None
+        seguinte = self._seguinte(dia)
+        if seguinte is not None:
+            self._estado[seguinte] = None
+
+    def atualizar(self, registos):
+        """Aplica um lote de registos (DataFrame com data, nome, score, contribuicao)."""
+        for dia, g in registos.groupby("data", sort=False):
+            dia = _dia(dia)
+            novos = _fatia(g)
+            fatia = self._fatias.get(dia)
+            if fatia is None:
+                insort(self._dias, dia)
+                self._fatias[dia] = novos
+            else:
+                # get_indexer usa a tabela de hash já construída do índice da fatia.
+                existe = fatia.index.get_indexer(novos.index) >= 0
+                if existe.any():
+                    fatia.loc[novos.index[existe], VALORES] = novos[existe].to_numpy()
+                if not existe.all():
+                    fatia = pd.concat([fatia, novos[~existe]])
+                self._fatias[dia] = fatia
+            self._invalidar(dia)
+
+    def remover(self, registos):
+        """Remove um lote de registos (DataFrame com data e nome)."""
+        for dia, g in registos.groupby("data", sort=False):
+            dia = _dia(dia)
+            fatia = self._fatias.get(dia)
+            if fatia is None:
+                continue
+            self._invalidar(dia)
+            fatia = fatia.drop(g["nome"].astype(object), errors="ignore")
+            if fatia.empty:
+                self._dias.remove(dia)
+                del self._fatias[dia]
+                del self._estado[dia]
+            else:
+                self._fatias[dia] = fatia
+
+    def dias_recentes(self, n=2):
+        """Os n dias mais recentes com registos, do mais recente para o mais antigo."""
+        return self._dias[-n:][::-1]
+
+    def comparar(self, final, inicial):
+        """Compara o dia final com o inicial (usa o resultado materializado se forem consecutivos)."""
+        fatia_final = self._fatias.get(final, _VAZIA)
+        if final in self._estado and inicial == self._anterior(final):
+            if self._estado[final] is None:
+                self._estado[final] = comparar_fatias(
+                    self._fatias.get(inicial, _VAZIA), fatia_final, inicial, final)
+            return self._estado[final]
+        return comparar_fatias(self._fatias.get(inicial, _VAZIA), fatia_final, inicial, final)
@@ -0,0 +1,220 @@
+"""
+Health check e métricas do bot, servidos com aiohttp no próprio event loop
+(sem threads: vários pedidos são atendidos em simultâneo).
+
+    GET /          "OK" (200) ou os motivos da falha (503), para o health check do alojamento
+    GET /health    o mesmo estado em JSON
+    GET /metrics   métricas no formato de texto do Prometheus
+
+O bot é dado como vivo se o event loop não estiver atrasado, se o heartbeat
+do gateway tiver resposta recente e se as tarefas vigiadas tiverem corrido
+dentro do limite. Só são vigiadas as tarefas que o bot arrancou (ex.: o
+check_bosses, quando substitui os loops da cog 'boss.py'). Se o loop estiver bloqueado de todo, o
+próprio pedido fica sem resposta e o health check do alojamento falha.
+"""
+import asyncio
+import math
+import time
+
+from aiohttp import web
+
+import desempenho
+
+PORTA = 8080
+# Intervalo entre medições do atraso do event loop. É também o batimento lido
+# pela vigia de bloqueios de desempenho.py, por isso é curto.
+INTERVALO_AMOSTRA = 0.1
+# Atraso do event loop a partir do qual o bot é dado como bloqueado.
+ATRASO_MAXIMO = 5.0
+# Idade máxima do último ACK do heartbeat (o Discord pede um a cada ~41 s).
+BATIMENTO_MAXIMO = 120.0
+
+
+class MonitorLoop:
+    """
+    Mede o atraso do event loop: dorme INTERVALO_AMOSTRA e regista quanto
+    tempo a mais demorou a acordar (tempo em que o loop esteve ocupado).
+    `batimento` é a hora (time.monotonic) do último acordar, lida pela vigia
+    de bloqueios (desempenho.VigiaLoop) a partir de outra thread.
+    """
+
+    def __init__(self, intervalo=INTERVALO_AMOSTRA):
+        self.intervalo = intervalo
+        self.atraso = 0.0
+        self.atraso_maximo = 0.0
+        self.amostras = 0
+        self.batimento = None
+        self._tarefa = None
+
+    def iniciar(self):
+        if self._tarefa is None or self._tarefa.done():
+            self._tarefa = asyncio.create_task(self._medir())
+
+    async def _medir(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self.batimento = time.monotonic()
+            inicio = loop.time()
+            await asyncio.sleep(self.intervalo)
+            self.atraso = max(0.0, loop.time() - inicio - self.intervalo)
+            self.atraso_maximo = max(self.atraso_maximo, self.atraso)
+            self.amostras += 1
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+        self.batimento = None
+
+
+class ServidorSaude:
+    """Servidor HTTP de health check e métricas, a correr no event loop do bot."""
+
+    def __init__(self, bot, porta=PORTA, host="0.0.0.0"):
+        self.bot = bot
+        self.porta = porta
+        self.host = host
+        self.monitor = MonitorLoop()
+        self.inicio = time.time()
+        self._tarefas = {}
+        self._runner = None
+
+    # --- Tarefas vigiadas ---
+
+    def vigiar(self, nome, limite, ativa=None):
+        """
+        Passa a vigiar uma tarefa periódica: se `ativa()` for verdadeiro e a
+        última execução tiver mais de `limite` segundos, o bot é dado como
+        não saudável. Sem `ativa`, a tarefa é vigiada depois da primeira execução.
+        """
+        self._tarefas[nome] = {"limite": limite, "ativa": ativa, "ultima": None}
+
+    def marcar(self, nome):
+        """Regista uma execução de uma tarefa vigiada."""
+        self._tarefas[nome]["ultima"] = time.time()
+
+    # --- Estado ---
+
+    def _idade_batimento(self):
+        # O discord.py não expõe a hora do último ACK: lida do keep-alive do gateway.
+        keep_alive = getattr(getattr(self.bot, "ws", None), "_keep_alive", None)
+        ultimo_ack = getattr(keep_alive, "_last_ack", None)
+        return None if ultimo_ack is None else time.perf_counter() - ultimo_ack
+
+    def estado(self):
+        """Dicionário com o estado do bot e a lista de motivos de falha (vazia se saudável)."""
+        agora = time.time()
+        latencia = self.bot.latency
+        batimento = self._idade_batimento()
+        motivos = []
+
+        if self.bot.is_closed():
+            motivos.append("bot fechado")
+        if self.monitor.atraso > ATRASO_MAXIMO:
+            motivos.append(f"event loop atrasado {self.monitor.atraso:.1f} s")
+        if batimento is not None and batimento > BATIMENTO_MAXIMO:
+            motivos.append(f"sem heartbeat do gateway há {batimento:.0f} s")
+
+        tarefas = {}
+        for nome, tarefa in self._tarefas.items():
+            ultima = tarefa["ultima"]
+            idade = None if ultima is None else agora - ultima
+            ativa = tarefa["ativa"]() if tarefa["ativa"] is not None else ultima is not None
+            tarefas[nome] = {"ativa": ativa, "ultima_execucao": ultima, "idade": idade}
+            # Uma tarefa ativa que ainda não correu conta desde o arranque.
+            sem_correr = idade if idade is not None else agora - self.inicio
+            if ativa and sem_correr > tarefa["limite"]:
+                motivos.append(f"{nome} sem correr há {sem_correr:.0f} s")
+
+        return {
+            "saudavel": not motivos,
+            "motivos": motivos,
+            "pronto": self.bot.is_ready(),
+            "tempo_ativo": agora - self.inicio,
+            "latencia_gateway": None if math.isinf(latencia) or math.isnan(latencia) else latencia,
+            "idade_heartbeat": batimento,
+            "atraso_loop": self.monitor.atraso,
+            "atraso_loop_maximo": self.monitor.atraso_maximo,
+            "servidores": len(self.bot.guilds),
+            "tarefas": tarefas,
+        }
+
+    def metricas(self):
+        """Texto no formato de exposição do Prometheus."""
+        estado = self.estado()
+        linhas = []
+
+        def metrica(nome, tipo, ajuda, valores):
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for etiquetas, valor in valores:
+                if valor is None:
+                    continue
+                linhas.append(f"{nome}{etiquetas} {float(valor)!r}")
+
+        metrica("blackforce_up", "gauge", "1 se o bot está saudável.",
+                [("", int(estado["saudavel"]))])
+        metrica("blackforce_ready", "gauge", "1 depois do on_ready.",
+                [("", int(estado["pronto"]))])
+        metrica("blackforce_uptime_seconds", "gauge", "Segundos desde o arranque.",
+                [("", estado["tempo_ativo"])])
+        metrica("blackforce_gateway_latency_seconds", "gauge", "Latência do heartbeat do gateway.",
+                [("", estado["latencia_gateway"])])
+        metrica("blackforce_heartbeat_age_seconds", "gauge", "Segundos desde o último ACK do heartbeat.",
+                [("", estado["idade_heartbeat"])])
+        metrica("blackforce_event_loop_lag_seconds", "gauge", "Atraso do event loop na última medição.",
+                [("", estado["atraso_loop"])])
+        metrica("blackforce_event_loop_lag_max_seconds", "gauge", "Maior atraso do event loop desde o arranque.",
+                [("", estado["atraso_loop_maximo"])])
+        metrica("blackforce_guilds", "gauge", "Servidores em que o bot está.",
+                [("", estado["servidores"])])
+        metrica("blackforce_task_last_run_timestamp_seconds", "gauge", "Hora (Unix) da última execução da tarefa.",
+                [(f'{{task="{nome}"}}', t["ultima_execucao"]) for nome, t in estado["tarefas"].items()])
+        # Histogramas dos comandos, tarefas e I/O.
+        return "\n".join(linhas) + "\n" + desempenho.metricas()
+
+    # --- Rotas ---
+
+    async def _raiz(self, request):
+        estado = self.estado()
+        if estado["saudavel"]:
+            return web.Response(text="OK")
+        return web.Response(text="FALHA: " + "; ".join(estado["motivos"]), status=503)
+
+    async def _health(self, request):
+        estado = self.estado()
+        return web.json_response(estado, status=200 if estado["saudavel"] else 503)
+
+    async def _metrics(self, request):
+        return web.Response(text=self.metricas(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    # --- Arranque e paragem ---
+
+    async def iniciar(self):
+        """Arranca o monitor do loop e o servidor HTTP (uma única vez)."""
+        self.monitor.iniciar()
+        if self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/", self._raiz)
+        app.router.add_get("/health", self._health)
+        app.router.add_get("/metrics", self._metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.porta).start()
+        except OSError:
+            await runner.cleanup()
+            raise
+        self._runner = runner
+
+    async def parar(self):
+        await self.monitor.parar()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,84 @@
+"""
+Modelo Gemini falso, compatível com a API REST (generateContent e
+streamGenerateContent com alt=sse), para testar o !perguntar sem chave nem rede.
+
+Uso: python stub_gemini.py [--porta 8091] [--atraso 1.0] [--repetir 1]
+     GEMINI_API_ENDPOINT=http://127.0.0.1:8091 python bot.py
+
+Cada resposta repete a pergunta recebida; com --repetir N a resposta é
+repetida N vezes (para testar respostas com mais de 2000 caracteres). Em
+streaming, a resposta é enviada aos bocados ao longo do atraso. O número de
+pedidos é mostrado na consola, para confirmar a cache e o limite de pedidos
+em simultâneo.
+"""
+import argparse
+import asyncio
+import json
+
+from aiohttp import web
+
+
+def criar_app(atraso=0.0, repetir=1):
+    estado = {"pedidos": 0, "ativos": 0}
+
+    def _resposta(texto):
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": texto}]},
+                "finishReason": "STOP",
+            }],
+        }
+
+    def _pergunta(corpo):
+        return " ".join(
+            p.get("text", "") for c in corpo.get("contents", []) for p in c.get("parts", [])
+        )
+
+    def _inicio(request):
+        estado["pedidos"] += 1
+        estado["ativos"] += 1
+        print(f"📨 Pedido #{estado['pedidos']} ({estado['ativos']} em simultâneo) para {request.match_info['modelo']}")
+        return estado["pedidos"]
+
+    async def generate_content(request):
+        numero = _inicio(request)
+        try:
+            pergunta = _pergunta(await request.json())
+            await asyncio.sleep(atraso)
+        finally:
+            estado["ativos"] -= 1
+        return web.json_response(_resposta(" ".join([f"Resposta #{numero} a: {pergunta}"] * repetir)))
+
+    async def stream_generate_content(request):
+        numero = _inicio(request)
+        try:
+            pergunta = _pergunta(await request.json())
+            palavras = " ".join([f"Resposta #{numero} a: {pergunta}"] * repetir).split(" ")
+            resposta = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await resposta.prepare(request)
+            for i in range(0, len(palavras), 5):
+                await asyncio.sleep(atraso * 5 / len(palavras))
+                pedaco = " ".join(palavras[i:i + 5]) + " "
+                await resposta.write(f"data: {json.dumps(_resposta(pedaco))}\r\n\r\n".encode())
+            await resposta.write_eof()
+            return resposta
+        finally:
+            estado["ativos"] -= 1
+
+    app = web.Application()
+    app.router.add_post("/v1beta/models/{modelo}:generateContent", generate_content)
+    app.router.add_post("/v1beta/models/{modelo}:streamGenerateContent", stream_generate_content)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=8091)
+    parser.add_argument("--atraso", type=float, default=1.0, help="segundos de espera por resposta")
+    parser.add_argument("--repetir", type=int, default=1, help="vezes que a resposta é repetida")
+    args = parser.parse_args()
+    web.run_app(criar_app(args.atraso, args.repetir), host="127.0.0.1", port=args.porta)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Servidor de OCR falso, compatível com a resposta do ocr.space, para testar o
+!inserirocr sem chave nem rede.
+
+Uso: python stub_ocr.py [--porta 8090] [--atraso 0.5]
+     OCR_API_URL=http://127.0.0.1:8090/parse/image OCR_API_KEY=teste python bot.py
+
+Se o "ficheiro" enviado for texto UTF-8, esse texto é devolvido como
+reconhecido (útil para testes); para imagens verdadeiras é devolvido um roster
+de exemplo. O número de pedidos recebidos é mostrado na consola, para
+confirmar a cache por hash.
+"""
+import argparse
+import asyncio
+
+from aiohttp import web
+
+ROSTER_EXEMPLO = "\n".join([
+    "# Nome Score Contribuição",
+    "1 Alpha 120 15,300",
+    "2 Bravo 98 12,050",
+    "3 Charlie 87 9,875",
+])
+
+
+def criar_app(atraso=0.0):
+    pedidos = 0
+
+    async def parse_image(request):
+        nonlocal pedidos
+        pedidos += 1
+        numero = pedidos
+        dados = await request.post()
+        if dados.get("apikey") in (None, ""):
+            return web.json_response({"IsErroredOnProcessing": True, "ErrorMessage": ["Chave em falta"]})
+        ficheiro = dados.get("file")
+        conteudo = ficheiro.file.read() if ficheiro is not None else b""
+        try:
+            texto = conteudo.decode("utf-8")
+        except UnicodeDecodeError:
+            texto = ROSTER_EXEMPLO
+        await asyncio.sleep(atraso)
+        print(f"📨 Pedido #{numero} ({len(conteudo)} bytes)")
+        return web.json_response({
+            "ParsedResults": [{"ParsedText": texto, "FileParseExitCode": 1}],
+            "OCRExitCode": 1,
+            "IsErroredOnProcessing": False,
+        })
+
+    app = web.Application()
+    app.router.add_post("/parse/image", parse_image)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=8090)
+    parser.add_argument("--atraso", type=float, default=0.5, help="segundos de espera por pedido")
+    args = parser.parse_args()
+    web.run_app(criar_app(args.atraso), host="127.0.0.1", port=args.porta)
+
+
+if __name__ == "__main__":
+    main()
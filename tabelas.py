@@ -0,0 +1,205 @@
+"""
+Tabelas de bosses e de Dungeons Overflow carregadas de um ficheiro JSON, que
+podem ser recarregadas sem reiniciar o bot (!recarregartabelas ou a vigia do
+ficheiro).
+
+Formato de tabelas.json:
+
+    {
+      "bosses": {
+        "Kzarka": {"mapa": "...", "tipo": "...", "recompensa": "...", "imagem": "https://...",
+                   "mapa_imagem": "https://...", "alerta_antecedencia": 5, ...horários...}
+      },
+      "ofd_dungeons": {
+        "0": [["Nome da dungeon", 50, "https://.../icone.png"]]
+      }
+    }
+
+Os dias das dungeons vão de 0 (segunda) a 6 (domingo). Os campos de horário de
+cada boss são os que o get_proximo_spawn do boss.py usa; cada boss é validado
+calculando já o próximo spawn. Sem o ficheiro ficam as tabelas do boss.py e do
+eventos.py.
+
+O ficheiro é lido e validado fora do event loop; só se estiver todo válido é
+que as tabelas são trocadas, de uma só vez e sem awaits pelo meio, por isso o
+event loop nunca vê uma tabela a meio. A troca é feita nos próprios
+dicionários BOSSES e OFD_DUNGEONS, para que as cogs que os importaram vejam os
+novos valores.
+"""
+import asyncio
+import json
+import os
+
+FICHEIRO_TABELAS = "tabelas.json"
+CAMPOS_BOSS = ("mapa", "tipo", "recompensa", "imagem")
+
+
+class TabelasInvalidas(ValueError):
+    def __init__(self, erros):
+        super().__init__("; ".join(erros))
+        self.erros = erros
+
+
+def _validar_bosses(brutos, proximo_spawn, erros):
+    bosses = {}
+    if not isinstance(brutos, dict):
+        erros.append("'bosses' deve ser um objeto {nome: dados}")
+        return bosses
+    for nome, data in brutos.items():
+        if not isinstance(data, dict):
+            erros.append(f"boss '{nome}': os dados devem ser um objeto")
+            continue
+        em_falta = [campo for campo in CAMPOS_BOSS if not data.get(campo)]
+        if em_falta:
+            erros.append(f"boss '{nome}': faltam {', '.join(em_falta)}")
+            continue
+        antecedencia = data.get("alerta_antecedencia", 5)
+        if isinstance(antecedencia, bool) or not isinstance(antecedencia, int) or antecedencia < 0:
+            erros.append(f"boss '{nome}': alerta_antecedencia deve ser um número inteiro de minutos")
+            continue
+        if proximo_spawn is not None:
+            try:
+                spawn = proximo_spawn(data)
+            except Exception as e:
+                erros.append(f"boss '{nome}': horário inválido ({e.__class__.__name__}: {e})")
+                continue
+            if spawn is not None and spawn.tzinfo is None:
+                erros.append(f"boss '{nome}': o próximo spawn não tem fuso horário")
+                continue
+        bosses[nome] = data
+    return bosses
+
+
+def _validar_dungeons(brutas, erros):
+    dungeons = {}
+    if not isinstance(brutas, dict):
+        erros.append("'ofd_dungeons' deve ser um objeto {dia: [dungeons]}")
+        return dungeons
+    for dia, lista in brutas.items():
+        try:
+            numero = int(dia)
+        except (TypeError, ValueError):
+            numero = -1
+        if not 0 <= numero <= 6:
+            erros.append(f"ofd_dungeons: dia '{dia}' inválido (0 = segunda ... 6 = domingo)")
+            continue
+        if not isinstance(lista, list):
+            erros.append(f"ofd_dungeons['{dia}']: deve ser uma lista")
+            continue
+        entradas = []
+        for i, entrada in enumerate(lista):
+            if (not isinstance(entrada, (list, tuple)) or len(entrada) != 3
+                    or not isinstance(entrada[0], str) or not isinstance(entrada[2], str)):
+                erros.append(f"ofd_dungeons['{dia}'][{i}]: deve ser [nome, nível, url do ícone]")
+                continue
+            entradas.append(tuple(entrada))
+        dungeons[numero] = entradas
+    return dungeons
+
+
+def validar(dados, proximo_spawn=None):
+    """
+    Valida o conteúdo do ficheiro e devolve (bosses, dungeons) prontos a
+    usar. Lança TabelasInvalidas com a lista de todos os erros encontrados.
+    """
+    if not isinstance(dados, dict):
+        raise TabelasInvalidas(["o ficheiro deve conter um objeto JSON"])
+    erros = []
+    bosses = _validar_bosses(dados.get("bosses", {}), proximo_spawn, erros)
+    dungeons = _validar_dungeons(dados.get("ofd_dungeons", {}), erros)
+    if erros:
+        raise TabelasInvalidas(erros)
+    return bosses, dungeons
+
+
+def ler(caminho, proximo_spawn=None):
+    """Lê e valida o ficheiro (chamada bloqueante)."""
+    with open(caminho, encoding="utf-8") as f:
+        try:
+            dados = json.load(f)
+        except json.JSONDecodeError as e:
+            raise TabelasInvalidas([f"JSON inválido: {e}"]) from e
+    return validar(dados, proximo_spawn)
+
+
+def alterados(antigas, novas):
+    """Chaves novas, removidas ou com valores diferentes entre duas tabelas."""
+    return {chave for chave in antigas.keys() | novas.keys() if antigas.get(chave) != novas.get(chave)}
+
+
+class Tabelas:
+    """
+    As tabelas BOSSES e OFD_DUNGEONS em uso e o ficheiro de onde são
+    recarregadas. Depois de cada troca são chamadas as funções registadas em
+    ao_recarregar, com os bosses e os dias alterados.
+    """
+
+    def __init__(self, bosses, dungeons, caminho=FICHEIRO_TABELAS, proximo_spawn=None):
+        self.bosses = bosses
+        self.dungeons = dungeons
+        self.caminho = caminho
+        self.proximo_spawn = proximo_spawn
+        self.versao = 0
+        self._mtime = None
+        self._ouvintes = []
+        self._lock = None
+
+    def ao_recarregar(self, funcao):
+        self._ouvintes.append(funcao)
+        return funcao
+
+    def _mtime_atual(self):
+        try:
+            return os.stat(self.caminho).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    async def recarregar(self, forcar=False):
+        """
+        Recarrega o ficheiro se tiver mudado desde a última tentativa (ou
+        sempre, com forcar). Devolve (bosses alterados, dias alterados), ou
+        None se não havia nada para recarregar. Um ficheiro inválido lança
+        TabelasInvalidas e as tabelas em uso ficam como estavam.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            mtime = self._mtime_atual()
+            if mtime is None:
+                if forcar:
+                    raise FileNotFoundError(self.caminho)
+                return None
+            if not forcar and mtime == self._mtime:
+                return None
+            # Um ficheiro inválido também fica marcado: só volta a ser lido depois de editado.
+            self._mtime = mtime
+            bosses, dungeons = await asyncio.to_thread(ler, self.caminho, self.proximo_spawn)
+
+            # Troca: a partir daqui não há awaits até todos os ouvintes terminarem.
+            bosses_alterados = alterados(self.bosses, bosses)
+            dias_alterados = alterados(self.dungeons, dungeons)
+            self.bosses.clear()
+            self.bosses.update(bosses)
+            self.dungeons.clear()
+            self.dungeons.update(dungeons)
+            self.versao += 1
+            for funcao in self._ouvintes:
+                funcao(bosses_alterados, dias_alterados)
+            return bosses_alterados, dias_alterados
+
+    def exportar(self):
+        """Grava as tabelas em uso no ficheiro (ponto de partida para as editar)."""
+        dados = {
+            "bosses": self.bosses,
+            "ofd_dungeons": {str(dia): [list(d) for d in lista] for dia, lista in self.dungeons.items()},
+        }
+        temporario = f"{self.caminho}.tmp"
+        try:
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(dados, f, ensure_ascii=False, indent=2)
+            os.replace(temporario, self.caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        # As tabelas em uso já correspondem ao ficheiro.
+        self._mtime = self._mtime_atual()